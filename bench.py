@@ -0,0 +1,492 @@
+"""Безоконный бенчмарк кадра для GameScene и GameSceneV2.
+
+Запуск: python bench.py --frames 600 --map-size 64 --resources 200
+Записанная сессия: python bench.py --replay session.rpl
+Генерация мира: python bench.py --worldgen 4096
+"""
+import argparse
+import gc
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import pygame  # noqa: E402
+
+import main  # noqa: E402
+from scripts.display import HEIGHT, WIDTH, display  # noqa: E402
+from scripts.levels import Level  # noqa: E402
+from scripts.replay import (  # noqa: E402
+    HeldKeys,
+    decode_events,
+    read_replay,
+    state_digest
+)
+from scripts.rng import seed_world  # noqa: E402
+from scripts.storage import redirect_stores, restore_stores  # noqa: E402
+from scripts.worldgen import generate_world  # noqa: E402
+
+SCENES = ('GameScene', 'GameSceneV2')
+
+# бюджет холодного старта, мс: насколько запуск до первого кадра сцены
+# может быть дольше голого "import pygame + set_mode" на той же машине
+STARTUP_BUDGET_MS = 500
+# опорный запуск для бюджета: интерпретатор, pygame и окно
+BASELINE_CODE = (
+    'import pygame; pygame.display.set_mode(({}, {})); '
+    'print("ready", flush=True)'
+)
+
+# сколько раз генерировать мир в режиме --worldgen
+WORLDGEN_RUNS = 3
+
+# сценарий ввода: (число кадров, зажатые клавиши)
+MOVES = (
+    (45, (pygame.K_d,)),
+    (45, (pygame.K_s,)),
+    (45, (pygame.K_a,)),
+    (45, (pygame.K_w,)),
+    (30, (pygame.K_d, pygame.K_s)),
+    (30, (pygame.K_a, pygame.K_w)),
+)
+HIT_EVERY = 15
+TAB_EVERY = 240
+
+
+class ScriptedKeys:
+    """Замена pygame.key.get_pressed() с заданным набором клавиш"""
+
+    def __init__(self, pressed=()):
+        self.pressed = set(pressed)
+
+    def __getitem__(self, key):
+        return key in self.pressed
+
+
+class BenchManager(main.SceneManager):
+    def __init__(self, screen, dirty_rects=False):
+        super().__init__(screen, dirty_rects)
+        self.keys = ScriptedKeys()
+        self.mouse = (0, 0), (False, False, False)
+
+    def get_pressed(self):
+        return self.keys
+
+    def get_mouse(self):
+        return self.mouse
+
+
+def make_level(size, with_furnace=False, seed=0):
+    """Квадратный остров size x size с озёрами, игрок в центре"""
+    rng = random.Random(seed)
+    rows = []
+    for y in range(size):
+        row = []
+        for x in range(size):
+            border = x in (0, size - 1) or y in (0, size - 1)
+            row.append('#' if border or rng.random() < 0.08 else '.')
+        rows.append(row)
+
+    cx = cy = size // 2
+    for y in range(cy - 2, cy + 3):
+        for x in range(cx - 2, cx + 4):
+            rows[y][x] = '.'
+    rows[cy][cx] = '@'
+    if with_furnace:
+        rows[cy][cx + 2] = '+'
+
+    return Level.from_rows([''.join(row) for row in rows])
+
+
+def script_input(manager, frame, idle=False):
+    """Клавиши и события для кадра frame"""
+    if idle:
+        manager.keys = ScriptedKeys()
+        return []
+
+    cycle = sum(count for count, _ in MOVES)
+    step = frame % cycle
+    for count, keys in MOVES:
+        if step < count:
+            manager.keys = ScriptedKeys(keys)
+            break
+        step -= count
+
+    events = []
+    if frame % HIT_EVERY == 0:
+        events.append(pygame.event.Event(
+            pygame.KEYDOWN, key=pygame.K_e, mod=0, unicode='e'))
+    if frame % TAB_EVERY == TAB_EVERY - 1:
+        events.append(pygame.event.Event(
+            pygame.KEYDOWN, key=pygame.K_TAB, mod=0, unicode='\t'))
+    return events
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    k = (len(ordered) - 1) * p / 100
+    low = int(k)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (k - low)
+
+
+def summary(values):
+    return {
+        'mean': statistics.fmean(values),
+        'p50': percentile(values, 50),
+        'p95': percentile(values, 95),
+        'p99': percentile(values, 99),
+    }
+
+
+def make_scene(manager, scene_name, args):
+    level = None
+    if args.map_size:
+        level = make_level(args.map_size, scene_name == 'GameSceneV2',
+                           args.seed)
+    scene_class = getattr(main, scene_name)
+    return scene_class(manager, level=level, resource_count=args.resources)
+
+
+def run_frames(manager, frames, trace_allocs=False, idle=False):
+    update_ms, draw_ms, frame_ms, alloc_kib, gc_runs = [], [], [], [], []
+
+    gc_count = [0]
+
+    def on_gc(phase, info):
+        if phase == 'start':
+            gc_count[0] += 1
+
+    gc.callbacks.append(on_gc)
+    try:
+        for frame in range(frames):
+            events = script_input(manager, frame, idle)
+            gc_count[0] = 0
+            if trace_allocs:
+                tracemalloc.reset_peak()
+                start_mem = tracemalloc.get_traced_memory()[0]
+
+            t0 = time.perf_counter()
+            pygame.event.pump()
+            manager.current_scene.handle_events(events)
+            manager.current_scene.update(manager.screen)
+            manager.metrics.step()
+            t1 = time.perf_counter()
+            manager.render()
+            t2 = time.perf_counter()
+
+            update_ms.append((t1 - t0) * 1000)
+            draw_ms.append((t2 - t1) * 1000)
+            frame_ms.append((t2 - t0) * 1000)
+            gc_runs.append(gc_count[0])
+            if trace_allocs:
+                peak = tracemalloc.get_traced_memory()[1]
+                alloc_kib.append((peak - start_mem) / 1024)
+
+            manager.end_frame(1 / max(t2 - t0, 1e-9))
+    finally:
+        gc.callbacks.remove(on_gc)
+
+    return update_ms, draw_ms, frame_ms, alloc_kib, gc_runs
+
+
+def bench_scene(scene_name, args):
+    seed_world(args.seed)
+    manager = BenchManager(display.open(), args.dirty_rects)
+    # снимок мира только в памяти: замер не трогает saves/ и повторяем
+    manager.persist_world = False
+    if args.metrics:
+        root, ext = os.path.splitext(args.metrics)
+        manager.metrics.export(f'{root}-{scene_name}{ext}')
+    manager.switch_to(make_scene(manager, scene_name, args))
+
+    run_frames(manager, args.warmup, idle=args.idle)
+    update_ms, draw_ms, frame_ms, _, gc_runs = run_frames(
+        manager, args.frames, idle=args.idle)
+
+    tracemalloc.start()
+    alloc_kib = run_frames(manager, args.alloc_frames, True, args.idle)[3]
+    tracemalloc.stop()
+
+    main.clear_screen()
+    manager.metrics.close()
+
+    return {
+        'scene': scene_name,
+        'frames': args.frames,
+        'map_size': args.map_size,
+        'resources': args.resources,
+        'dirty_rects': args.dirty_rects,
+        'idle': args.idle,
+        'frame_ms': summary(frame_ms),
+        'update_ms': summary(update_ms),
+        'draw_ms': summary(draw_ms),
+        'alloc_kib_per_frame': statistics.fmean(alloc_kib) if alloc_kib else 0.0,
+        'gc_runs_per_frame': statistics.fmean(gc_runs),
+    }
+
+
+def bench_replay(args):
+    """Прогон записанной сессии: те же кадры и шаги, что при записи"""
+    replay = read_replay(args.replay)
+    restore_stores(replay.player_data)
+    seed_world(replay.seed)
+
+    manager = BenchManager(display.open(), args.dirty_rects)
+    manager.persist_world = False
+    if args.metrics:
+        manager.metrics.export(args.metrics)
+    manager.switch_to(getattr(main, replay.scene)(manager))
+
+    update_ms, draw_ms, frame_ms = [], [], []
+    for steps, keys, mouse, codes in replay.frames:
+        # экран загрузки между уровнями в записи не участвует
+        while not manager.current_scene.recordable:
+            manager.current_scene.update(manager.screen)
+            manager.render()
+
+        manager.keys = HeldKeys(keys)
+        manager.mouse = mouse
+
+        t0 = time.perf_counter()
+        pygame.event.pump()
+        manager.current_scene.handle_events(decode_events(codes))
+        for _ in range(steps):
+            manager.current_scene.update(manager.screen)
+            manager.metrics.step()
+        t1 = time.perf_counter()
+        manager.render()
+        t2 = time.perf_counter()
+
+        update_ms.append((t1 - t0) * 1000)
+        draw_ms.append((t2 - t1) * 1000)
+        frame_ms.append((t2 - t0) * 1000)
+        manager.end_frame(1 / max(t2 - t0, 1e-9))
+
+    scene = manager.current_scene
+    match = None
+    if replay.digest is not None and scene.recordable:
+        match = state_digest(scene) == replay.digest
+
+    main.clear_screen(getattr(scene, 'world', None))
+    manager.metrics.close()
+
+    return {
+        'replay': args.replay,
+        'scene': replay.scene,
+        'frames': len(replay.frames),
+        'dirty_rects': args.dirty_rects,
+        'frame_ms': summary(frame_ms),
+        'update_ms': summary(update_ms),
+        'draw_ms': summary(draw_ms),
+        'match': match,
+    }
+
+
+def print_replay(result):
+    verdict = {True: 'state matches the recording',
+               False: 'STATE DIVERGED from the recording',
+               None: 'recording has no final state to compare'}
+    print(f"{result['replay']}: {result['frames']} frames from "
+          f"{result['scene']}{', dirty rects' if result['dirty_rects'] else ''}")
+    for name in ('frame_ms', 'update_ms', 'draw_ms'):
+        stats = result[name]
+        print(f"  {name:<10} mean {stats['mean']:7.3f}  p50 {stats['p50']:7.3f}"
+              f"  p95 {stats['p95']:7.3f}  p99 {stats['p99']:7.3f}")
+    print(f"  {verdict[result['match']]}")
+
+
+def first_frame(scene_name):
+    """Дочерний процесс замера старта: окно, сцена и первый кадр"""
+    screen = display.open()
+    manager = BenchManager(screen)
+    manager.persist_world = False
+    manager.switch_to(getattr(main, scene_name)(manager))
+    manager.current_scene.update(screen)
+    manager.render()
+    print('ready', flush=True)
+
+    # сохранения игрока не трогаем
+    from scripts.storage import stores
+    for store in stores:
+        store.dirty = False
+    return 0
+
+
+def time_to_ready(command, name):
+    """Время от запуска процесса command до строки ready, мс"""
+    start = time.perf_counter()
+    child = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+    for line in child.stdout:
+        if line.strip() == 'ready':
+            break
+    elapsed = (time.perf_counter() - start) * 1000
+    child.wait()
+    if child.returncode:
+        raise RuntimeError(f'{name}: first frame failed')
+    return elapsed
+
+
+def cold_start(scene_name):
+    """Время от запуска процесса до первого кадра сцены, мс"""
+    return time_to_ready(
+        [sys.executable, os.path.abspath(__file__), '--first-frame', scene_name],
+        scene_name)
+
+
+def baseline_start():
+    """Время запуска голого pygame с окном того же размера, мс"""
+    code = BASELINE_CODE.format(WIDTH, HEIGHT)
+    return time_to_ready([sys.executable, '-c', code], 'baseline')
+
+
+def bench_startup(scene_name, args, baseline):
+    times = [cold_start(scene_name) for _ in range(args.startup)]
+    startup = summary(times)
+    return {
+        'scene': scene_name,
+        'runs': args.startup,
+        'startup_ms': startup,
+        'baseline_ms': baseline,
+        'over_baseline_ms': startup['p50'] - baseline['p50'],
+        'budget_ms': args.budget_ms,
+    }
+
+
+def print_startup(result):
+    stats = result['startup_ms']
+    over = result['over_baseline_ms']
+    verdict = 'ok' if over <= result['budget_ms'] else 'OVER BUDGET'
+    print(f"{result['scene']}: cold start to first frame, {result['runs']} runs")
+    print(f"  startup_ms mean {stats['mean']:7.1f}  p50 {stats['p50']:7.1f}"
+          f"  p95 {stats['p95']:7.1f}")
+    print(f"  baseline p50 {result['baseline_ms']['p50']:7.1f}  over it "
+          f"{over:7.1f}  budget {result['budget_ms']} - {verdict}")
+
+
+def bench_worldgen(args):
+    """Время генерации мира args.worldgen x args.worldgen, seed подряд"""
+    times = []
+    for run in range(WORLDGEN_RUNS):
+        start = time.perf_counter()
+        level = generate_world(args.worldgen, args.seed + run, args.workers)
+        times.append((time.perf_counter() - start) * 1000)
+    return {
+        'world_size': args.worldgen,
+        'runs': WORLDGEN_RUNS,
+        'workers': args.workers,
+        'worldgen_ms': summary(times),
+        'furnaces': len(level.furnaces),
+    }
+
+
+def print_worldgen(result):
+    stats = result['worldgen_ms']
+    size = result['world_size']
+    print(f"worldgen {size}x{size}: {result['runs']} seeds, "
+          f"{result['workers']} workers")
+    print(f"  worldgen_ms mean {stats['mean']:8.1f}  p50 {stats['p50']:8.1f}"
+          f"  p95 {stats['p95']:8.1f}")
+
+
+def print_result(result):
+    print(f"{result['scene']}: {result['frames']} frames, "
+          f"map {result['map_size'] or 'default'}, "
+          f"{result['resources']} resources"
+          f"{', dirty rects' if result['dirty_rects'] else ''}"
+          f"{', idle' if result['idle'] else ''}")
+    for name in ('frame_ms', 'update_ms', 'draw_ms'):
+        stats = result[name]
+        print(f"  {name:<10} mean {stats['mean']:7.3f}  p50 {stats['p50']:7.3f}"
+              f"  p95 {stats['p95']:7.3f}  p99 {stats['p99']:7.3f}")
+    print(f"  alloc      {result['alloc_kib_per_frame']:.1f} KiB/frame peak, "
+          f"{result['gc_runs_per_frame']:.3f} gc runs/frame")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scene', choices=SCENES + ('all',), default='all')
+    parser.add_argument('--frames', type=int, default=600)
+    parser.add_argument('--warmup', type=int, default=60)
+    parser.add_argument('--alloc-frames', type=int, default=120,
+                        help='кадры отдельного прогона с tracemalloc')
+    parser.add_argument('--map-size', type=int, default=0,
+                        help='сторона сгенерированной карты в клетках; '
+                             '0 - карта сцены из levels/')
+    parser.add_argument('--resources', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--dirty-rects', action='store_true',
+                        help='режим перерисовки изменившихся областей')
+    parser.add_argument('--idle', action='store_true',
+                        help='игрок стоит на месте, без ввода')
+    parser.add_argument('--startup', type=int, default=0, metavar='RUNS',
+                        help='замерить холодный старт RUNS раз вместо кадров')
+    parser.add_argument('--budget-ms', type=float, default=STARTUP_BUDGET_MS,
+                        help='на сколько мс старт может быть дольше голого '
+                             'pygame с окном')
+    parser.add_argument('--first-frame', choices=SCENES,
+                        help=argparse.SUPPRESS)
+    parser.add_argument('--metrics', metavar='PATH',
+                        help='выгрузить замеры каждого кадра в JSONL '
+                             '(или CSV для .csv); к имени добавляется сцена')
+    parser.add_argument('--replay', metavar='PATH',
+                        help='прогнать сессию, записанную main.py --record')
+    parser.add_argument('--worldgen', type=int, default=0, metavar='SIZE',
+                        help='замерить генерацию мира SIZE x SIZE вместо кадров')
+    parser.add_argument('--workers', type=int, default=1,
+                        help='процессов для генерации мира')
+    parser.add_argument('--json', help='записать результаты в JSON-файл')
+    return parser.parse_args(argv)
+
+
+def main_bench(argv=None):
+    args = parse_args(argv)
+    if args.first_frame:
+        return first_frame(args.first_frame)
+
+    # сохранения игрока не трогаем
+    import scripts.objects.player  # noqa: F401
+    redirect_stores(tempfile.mkdtemp(prefix='bench-'))
+
+    scenes = SCENES if args.scene == 'all' else (args.scene,)
+    if args.worldgen:
+        results = [bench_worldgen(args)]
+        print_worldgen(results[0])
+    elif args.replay:
+        results = [bench_replay(args)]
+        print_replay(results[0])
+    elif args.startup:
+        baseline = summary([baseline_start() for _ in range(args.startup)])
+        results = [bench_startup(name, args, baseline) for name in scenes]
+        for result in results:
+            print_startup(result)
+    else:
+        results = [bench_scene(name, args) for name in scenes]
+        for result in results:
+            print_result(result)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=4)
+
+    if args.startup and any(
+            r['over_baseline_ms'] > r['budget_ms'] for r in results):
+        return 1
+    if args.replay and results[0]['match'] is False:
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main_bench())
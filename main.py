@@ -1,28 +1,61 @@
+import random
 import sys
-import pygame
-
-
-# Constants
-FPS = 60
-WIDTH = 800
-HEIGHT = 640
-
-# Init
-pygame.init()
-
-screen = pygame.display.set_mode((WIDTH, HEIGHT))
-clock = pygame.time.Clock()
-
-# Global variables
-# player = None
+import tempfile
+import time
 
+import pygame
 
-def terminate():
-    pygame.quit()
-    sys.exit()
+from scripts.dirty import DirtyTracker
+from scripts.display import display, FPS, WIDTH, HEIGHT
+from scripts.metrics import FrameMetrics, PerfOverlay
+from scripts.navigation import Route, around, cell_at
+from scripts.render import Layer, RenderPipeline
+from scripts.replay import InputRecorder, ends_session
+from scripts.rng import seed_world
+from scripts.storage import (
+    flush_all,
+    redirect_stores,
+    restore_stores,
+    snapshot_stores
+)
+from scripts.utils import (
+    all_sprites,
+    collision_grid,
+    resource_group,
+    exp_bar_group,
+    inventory_group,
+    forge_group,
+    furnace_interface_group,
+    tiles_group,
+    screen_items
+)
+from scripts.objects.camera import Camera
+from scripts.objects.map import generate_level, load_level, preload_assets
+from scripts.objects.objects import FurnaceInterface, health_bar_items
+from scripts.objects.particles import particle_system
+from scripts.objects.player import player_group, hearts_group
+from scripts.objects.screens import start_screen, loading_screen, end_screen
+from scripts.objects.world import World
+from scripts.saves import WorldSave, save_path
+
+
+# Симуляция идёт фиксированными шагами независимо от частоты отрисовки
+TICK_RATE = 60
+STEP = 1 / TICK_RATE
+# Больше этого за кадр не догоняем, иначе после зависания игра "убежит"
+MAX_FRAME_TIME = 0.25
+# Нижняя граница частоты отрисовки при нехватке времени на кадр
+MIN_RENDER_FPS = 20
+# Цвет за краем карты
+WATER_COLOR = pygame.Color(56, 152, 255)
+# Сколько времени шага экран загрузки отдаёт подготовке следующей сцены
+LOAD_BUDGET = STEP / 2
 
 
 class Scene:
+    # кадры сцены попадают в запись ввода (--record)
+    recordable = False
+
     def __init__(self, manager):
         self.manager = manager  # Менеджер сцен
         self.screen = manager.screen  # Экран для отрисовки
@@ -32,12 +65,31 @@ class Scene:
     #     raise NotImplementedError
 
     def update(self, screen):
-        """Обновление логики"""
+        """Шаг логики длиной STEP секунд"""
         raise NotImplementedError
 
-    def draw(self):
+    def draw(self, screen):
         """Отрисовка содержимого"""
-        raise NotImplementedError
+        pass
+
+    def draw_items(self):
+        """Список отрисовки для режима грязных прямоугольников.
+
+        None - сцена его не поддерживает и рисуется целиком.
+        """
+        return None
+
+    def view_key(self):
+        """Положение камеры; при его смене экран перерисовывается целиком"""
+        return None
+
+    def prepare(self):
+        """Подготовка сцены до активации.
+
+        Генератор выдаёт долю готовности от 0 до 1; LoadingWindow
+        выполняет его понемногу каждый шаг, чтобы окно не замирало.
+        """
+        return iter(())
 
     def on_activate(self):
         """Вызывается при активации сцены"""
@@ -49,11 +101,56 @@ class Scene:
 
 
 class SceneManager:
-    def __init__(self, screen):
+    def __init__(self, screen, dirty_rects=False):
         self.screen = screen
         self.running = True
         self.current_scene = None
         self.shared_data = {}
+        # длительность шага симуляции в секундах
+        self.dt = STEP
+        # доля шага, прошедшая после последнего обновления (для интерполяции)
+        self.alpha = 1.0
+        # текущая частота отрисовки; 0 - без ограничения
+        self.render_fps = FPS
+        # сглаженное время работы кадра без ожидания
+        self.frame_load = 0.0
+
+        # перерисовывать только изменившиеся области экрана
+        self.dirty_rects = dirty_rects
+        self.dirty_tracker = DirtyTracker(screen.get_rect())
+
+        # сохранять мир в saves/; без этого снимок живёт до конца сцены
+        self.persist_world = True
+        # запись ввода игровых сцен (--record)
+        self.recorder = None
+
+        # замеры кадра и оверлей с ними (F3)
+        self.metrics = FrameMetrics()
+        self.metrics.particles = particle_system
+        self.overlay = PerfOverlay((10, screen.get_height() - 10))
+
+    def get_pressed(self):
+        """Состояние клавиш; бенчмарк подменяет его сценарием"""
+        return pygame.key.get_pressed()
+
+    def get_mouse(self):
+        """Позиция и кнопки мыши; бенчмарк подменяет их записью"""
+        return pygame.mouse.get_pos(), pygame.mouse.get_pressed()
+
+    def record(self, path, seed):
+        """Записывать ввод в отдельной сессии: сохранения игрока
+        переносятся во временный каталог, мир не сохраняется"""
+        seed_world(seed)
+        data = snapshot_stores()
+        self.recorder = InputRecorder(path, seed, data)
+        self.persist_world = False
+        redirect_stores(tempfile.mkdtemp(prefix='record-'))
+        restore_stores(data)
+
+    def stop_recording(self):
+        if self.recorder is not None:
+            self.recorder.finish(self.current_scene)
+            self.recorder = None
 
     def switch_to(self, new_scene):
         """Переключение на новую сцену"""
@@ -61,23 +158,156 @@ class SceneManager:
             self.current_scene.on_deactivate()
         self.current_scene = new_scene
         self.current_scene.on_activate()
+        self.dirty_tracker.reset()
+
+    def close(self):
+        """Деактивировать текущую сцену при выходе из игры"""
+        self.stop_recording()
+        if self.current_scene:
+            self.current_scene.on_deactivate()
+            self.current_scene = None
+
+    def render(self):
+        """Отрисовка текущей сцены и вывод на экран"""
+        scene = self.current_scene
+        stage = self.metrics.stage
+        with stage('draw_items'):
+            items = scene.draw_items() if self.dirty_rects else None
+
+        if items is None:
+            scene.draw(self.screen)
+            self.screen.blits([
+                (image, rect) for _, image, rect in self.overlay.items()
+            ], False)
+            with stage('flip'):
+                pygame.display.flip()
+            return
+
+        items += self.overlay.items()
+        rects = self.dirty_tracker.collect(items, scene.view_key())
+        if rects is None:
+            scene.render(self.screen, items)
+            with stage('flip'):
+                pygame.display.flip()
+            return
+
+        if not rects:
+            return
+
+        # каждую область отдельно: общая рамка областей у разных краёв
+        # экрана - почти весь экран
+        for rect in rects:
+            self.screen.set_clip(rect)
+            scene.render(self.screen, items)
+        self.screen.set_clip(None)
+        with stage('flip'):
+            pygame.display.update(rects)
+
+    def end_frame(self, fps):
+        """Закрыть замеры кадра и передать их оверлею"""
+        self.overlay.add(self.metrics.end_frame(fps))
+
+    def adapt_render_rate(self, work_time):
+        """Снизить частоту отрисовки под нагрузкой и вернуть её обратно"""
+        self.frame_load += (work_time - self.frame_load) * 0.1
+        if not self.render_fps:
+            return
+
+        budget = 1 / self.render_fps
+        if self.frame_load > budget * 0.9 and self.render_fps > MIN_RENDER_FPS:
+            self.render_fps = max(MIN_RENDER_FPS, self.render_fps // 2)
+        elif self.frame_load < budget * 0.4 and self.render_fps < FPS:
+            self.render_fps = min(FPS, self.render_fps * 2)
 
     def run(self):
         """Основной игровой цикл"""
         clock = pygame.time.Clock()
+        accumulator = 0.0
+        frame_time = 0.0
         while self.running:
+            start = pygame.time.get_ticks()
+            accumulator += min(frame_time, MAX_FRAME_TIME)
+
             events = pygame.event.get()
             for event in events:
                 if event.type == pygame.QUIT:
                     self.running = False
+                if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                    self.overlay.toggle()
+
+            scene = self.current_scene
+            recorder = self.recorder if scene.recordable else None
+            if recorder is not None:
+                if ends_session(events):
+                    # сводку снимаем до того, как сцена всё уберёт
+                    self.stop_recording()
+                    recorder = None
+                else:
+                    recorder.start(scene)
+
+            scene.handle_events(events)
 
-            self.current_scene.handle_events(events)
-            self.current_scene.update(screen)
-            # print(self.current_scene)
-            # screen.fill(pygame.Color(56, 152, 255))  # Очистка экрана
+            # сменилась сцена - оставшиеся шаги достанутся ей в следующем
+            # кадре, уже с записью, иначе воспроизведение их не повторит
+            steps = 0
+            while accumulator >= STEP and self.running \
+                    and self.current_scene is scene:
+                scene.update(self.screen)
+                self.metrics.step()
+                accumulator -= STEP
+                steps += 1
 
-            pygame.display.flip()
-            clock.tick(FPS)
+            if recorder is not None:
+                recorder.record(
+                    steps, self.get_pressed(), self.get_mouse(), events)
+
+            self.alpha = accumulator / STEP
+            self.render()
+            self.end_frame(clock.get_fps())
+
+            self.adapt_render_rate((pygame.time.get_ticks() - start) / 1000)
+            frame_time = clock.tick(self.render_fps) / 1000
+
+
+# Слои игровых сцен
+
+
+def ground_layer(scene):
+    return tiles_group.sprite.items(scene.camera)
+
+
+def resources_layer(scene):
+    camera = scene.camera
+    resources = scene.nearby(resource_group)
+    return (camera.items(resources)
+            + camera.items(scene.nearby(forge_group))
+            + health_bar_items(resources, camera))
+
+
+def player_layer(scene):
+    player = scene.player
+    rect = player.render_rect(scene.manager.alpha)
+    return [(player, player.image, scene.camera.apply(rect))]
+
+
+def effects_layer(scene):
+    return particle_system.items(scene.camera)
+
+
+def ui_layer(scene):
+    return (screen_items(hearts_group)
+            + screen_items(exp_bar_group)
+            + screen_items(inventory_group)
+            + screen_items(furnace_interface_group))
+
+
+GAME_LAYERS = [
+    Layer('ground', ground_layer, static=True),
+    Layer('resources', resources_layer),
+    Layer('player', player_layer),
+    Layer('effects', effects_layer),
+    Layer('ui', ui_layer),
+]
 
 
 # Windows
@@ -85,282 +315,387 @@ class SceneManager:
 
 class MainMenu(Scene):
     def __init__(self, manager):
-        from scripts.objects.screens import start_screen, end_screen
         super().__init__(manager)
         start_screen()
 
     def handle_events(self, events):
         for event in events:
             if event.type == pygame.QUIT:
-                manager.running = False
+                self.manager.running = False
 
     def update(self, screen):
-        manager.switch_to(GameScene(manager))
+        self.manager.switch_to(
+            LoadingWindow(self.manager, GameScene(self.manager)))
         return "end"
 
 
-class ReloadWindow(Scene):
-    def __init__(self, manager, scnene_name):
-        from scripts.objects.screens import reload_screen
-        super().__init__(manager)
-        self.scnene_name = scnene_name
-
-        if self.scnene_name == "":
-            raise "Scnene_name is empty"
+class LoadingWindow(Scene):
+    """Экран загрузки: готовит scene по шагам и переключается на неё"""
 
-        reload_screen()
+    def __init__(self, manager, scene):
+        super().__init__(manager)
+        self.scene = scene
+        self.steps = scene.prepare()
+        self.progress = 0.0
+        self.ticks = 0
+        self.done = False
 
     def handle_events(self, events):
         for event in events:
             if event.type == pygame.QUIT:
-                manager.running = False
+                self.manager.running = False
 
     def update(self, screen):
-        if self.scnene_name == "GameSceneV2":
-            manager.switch_to(GameSceneV2(manager))
-        print(self.scnene_name)
-        return "end"
+        self.ticks += 1
+        deadline = time.perf_counter() + LOAD_BUDGET
+        try:
+            while time.perf_counter() < deadline:
+                self.progress = next(self.steps)
+        except StopIteration:
+            self.done = True
+            self.manager.switch_to(self.scene)
+
+    def draw(self, screen):
+        loading_screen(screen, self.progress, self.ticks)
+
+    def on_deactivate(self):
+        # выход из игры посреди загрузки - закрываем недостроенную сцену
+        if not self.done:
+            self.steps.close()
+            self.scene.on_deactivate()
 
 
 class EndWindow(Scene):
     def __init__(self, manager):
-        from scripts.objects.screens import end_screen
         super().__init__(manager)
         end_screen()
 
     def handle_events(self, events):
         for event in events:
             if event.type == pygame.QUIT:
-                manager.running = False
+                self.manager.running = False
 
     def update(self, screen):
-        manager.running = False
+        self.manager.running = False
         return "end"
 
 
 # Scenes
 
 
-class GameScene(Scene):
-    def __init__(self, manager):
+class BaseGameScene(Scene):
+    """Общее у игровых сцен: мир, игрок, камера, движение и отрисовка"""
+    level_file = None
+    recordable = True
+
+    def __init__(self, manager, level=None, resource_count=10):
         super().__init__(manager)
+        # уровень можно передать готовым списком строк (бенчмарк)
+        self.level = level
+        self.resource_count = resource_count
+        # направление движения с последнего кадра; None - стоим
+        self.direction = None
+        # путь по клику мыши и была ли кнопка зажата в прошлом кадре
+        self.route = None
+        self.mouse_down = False
+
+        self.world = None
+        self.ready = False
+        self.pipeline = RenderPipeline(GAME_LAYERS, WATER_COLOR)
+
+    def prepare(self):
+        yield from prepare_game(self)
 
     def on_activate(self):
         super().on_activate()
-        from scripts.objects.map import generate_level, update_level
-        from scripts.objects.map import load_level
-        from scripts.objects.camera import Camera
-        self.player, x, y = generate_level(load_level('main_level.txt'))
+        # сцену включили без экрана загрузки - готовим её целиком
+        for _ in self.prepare():
+            pass
+
+    def on_deactivate(self):
+        super().on_deactivate()
+        if self.world is not None:
+            self.world.close()
+
+    def nearby(self, group):
+        """Спрайты group в видимой области камеры с запасом"""
+        return self.camera.visible(group, collision_grid)
 
-        self.camera = Camera()
+    def stream_view(self):
+        """Области мира, вокруг которых держатся загруженные чанки"""
+        return self.camera.view_rect, self.player.rect
+
+    def ui_open(self):
+        """Открыто окно, которое забирает управление у движения"""
+        return self.player.inventory.is_visible
+
+    def handle_key(self, key):
+        if key == pygame.K_e:
+            self.player.hit()
+        if key == pygame.K_TAB:
+            self.player.inventory.toggle_visibility()
+
+        if key == pygame.K_ESCAPE:
+            clear_screen(self.world)
+            self.manager.switch_to(EndWindow(self.manager))
 
     def handle_events(self, events):
         for event in events:
             if event.type == pygame.QUIT:
-                manager.running = False
-            if event.type == pygame.KEYDOWN and event.key == pygame.K_e:
-                self.player.hit()
-            if event.type == pygame.KEYDOWN and event.key == pygame.K_TAB:
-                self.player.inventory.toggle_visibility()
-
-            if event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
-                clear_screen()
-                manager.switch_to(EndWindow(manager))
-
-            if event.type == pygame.KEYDOWN and event.key == pygame.K_p and self.player.level >= 5:
-                clear_screen()
-                manager.switch_to(ReloadWindow(manager, "GameSceneV2"))
+                self.manager.running = False
+            if event.type == pygame.KEYDOWN:
+                self.handle_key(event.key)
 
-        keys = pygame.key.get_pressed()
+        keys = self.manager.get_pressed()
 
-        if not self.player.inventory.is_visible:
-            direction = {
+        if not self.ui_open():
+            self.direction = {
                 'left': keys[pygame.K_LEFT] or keys[pygame.K_a],
                 'right': keys[pygame.K_RIGHT] or keys[pygame.K_d],
                 'up': keys[pygame.K_UP] or keys[pygame.K_w],
                 'down': keys[pygame.K_DOWN] or keys[pygame.K_s]
             }
-
-            self.player.move_self(direction)
         else:
-            self.player.stop_moving()
+            self.direction = None
+
+        # клавиши движения отменяют путь по клику
+        if self.direction is not None and any(self.direction.values()):
+            self.route = None
+        click = self.read_click(self.direction is None)
+        if click is not None:
+            self.route = self.plan_route(*click)
+
+    def read_click(self, ui_open):
+        """Точка мира, куда в этом кадре нажали левой кнопкой, или None.
+        Мышь берём у менеджера, чтобы клики попадали в запись ввода"""
+        pos, buttons = self.manager.get_mouse()
+        clicked = buttons[0] and not self.mouse_down
+        self.mouse_down = buttons[0]
+        if not clicked or ui_open:
+            return None
+        return self.camera.pick(*pos)
+
+    def plan_route(self, x, y):
+        """Путь к точке мира; к ресурсу - чтобы его добыть, к печи -
+        подойти. None - пути нет"""
+        navigator = self.world.navigator
+        start = cell_at(*self.player.rect.center)
+
+        resources = collision_grid.query_point(x, y, resource_group)
+        if resources:
+            target = min(resources, key=lambda resource: resource.cell)
+            # справа игрок упирается в ресурс, не задев его, и ударить
+            # оттуда не сможет; подходим с остальных сторон
+            x, y = target.cell
+            path = navigator.find_path_to_any(
+                start, [(x, y - 1), (x, y + 1), (x - 1, y)])
+            return Route(path, target, mine=True) if path else None
+
+        furnaces = collision_grid.query_point(x, y, forge_group)
+        if furnaces:
+            target = furnaces[0]
+            cell = cell_at(target.rect.x, target.rect.y)
+            path = navigator.find_path_to_any(start, around(cell, 2))
+            return Route(path, target) if path else None
+
+        path = navigator.find_path(start, cell_at(x, y))
+        return Route(path) if path else None
+
+    def steer(self):
+        """Направление на шаг: клавиши, а если ни одна не нажата - путь
+        по клику"""
+        if self.direction is None:
+            # открыт интерфейс - стоим
+            self.route = None
+            return None
+
+        if self.route is not None and not any(self.direction.values()):
+            direction = self.route.update(self.player, self.manager.dt)
+            if direction is not None:
+                return direction
+            self.route = None
+        return self.direction
+
+    def update_objects(self):
+        """Шаг объектов мира кроме игрока; ресурсы статичны"""
+        pass
 
-    def update(self, screen):
-        from scripts.utils import (
-            tiles_group,
-            all_sprites,
-            grount_group,
-            water_group,
-            resource_group,
-            resource_bars_group,
-            exp_bar_group,
-            inventory_group,
-            stars_group
-        )
-        from scripts.objects.objects import generate_resource
-        from scripts.objects.player import player_group
-
-        screen.fill(pygame.Color(56, 152, 255))
-        tiles_group.draw(screen)
-
-        while len(resource_group) < 10:
-            generate_resource()
-
-        water_group.draw(screen)
-        grount_group.draw(screen)
-
-        resource_group.draw(screen)
-        resource_group.update()
-
-        resource_bars_group.draw(screen)
-
-        player_group.draw(screen)
-        player_group.update()
-
-        exp_bar_group.draw(screen)
+    def update_ui(self):
         exp_bar_group.update(self.player.experience)
-
-        inventory_group.draw(screen)
         inventory_group.update()
 
-        stars_group.draw(screen)
-        stars_group.update()
-
-        self.camera.update(self.player)
-
-        for sprite in all_sprites:
-            self.camera.apply(sprite)
+    def update(self, screen):
+        stage = self.manager.metrics.stage
+        with stage('world'):
+            self.world.update(*self.stream_view())
+            self.spawner.fill(self.resource_count, resource_group)
+            self.world.autosave(self.manager.dt)
+
+        with stage('player'):
+            self.player.remember_position()
+            direction = self.steer()
+            if direction is not None:
+                self.player.move_self(direction)
+            else:
+                self.player.stop_moving()
+            player_group.update()
+
+        with stage('resources'):
+            self.update_objects()
+        with stage('ui'):
+            self.update_ui()
+        with stage('particles'):
+            particle_system.update()
+
+        with stage('camera'):
+            self.camera.update(self.player, self.manager.dt)
 
         if self.player.health == 0:
-            manager.running = False
+            self.manager.running = False
 
-    def draw(self):
-        self.screen.blit(self.background, (0, 0))
-        self.entities.draw(self.screen)
-        self.player.draw(self.screen)
+    def draw_items(self):
+        self.camera.interpolate(self.manager.alpha)
+        return self.pipeline.collect(self)
 
+    def view_key(self):
+        return self.camera.offset
 
-class GameSceneV2(Scene):
-    def __init__(self, manager):
-        super().__init__(manager)
+    def render(self, screen, items):
+        self.pipeline.render(screen, self, items)
 
-    def on_activate(self):
-        super().on_activate()
-        from scripts.objects.map import generate_level
-        from scripts.objects.map import load_level
-        from scripts.objects.camera import Camera
-        self.player, x, y = generate_level(load_level('map_with_furnace.txt'))
-
-        self.camera = Camera()
+    def draw(self, screen):
+        with self.manager.metrics.stage('draw_items'):
+            items = self.draw_items()
+        self.render(screen, items)
 
-    def handle_events(self, events):
-        from scripts.utils import forge_group
-
-        for event in events:
-            if event.type == pygame.QUIT:
-                manager.running = False
-            if event.type == pygame.KEYDOWN and event.key == pygame.K_e:
-                self.player.hit()
-            if event.type == pygame.KEYDOWN and event.key == pygame.K_TAB:
-                self.player.inventory.toggle_visibility()
-            if event.type == pygame.KEYDOWN and event.key == pygame.K_f:
-                self.player.active()
-
-            if event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE:
-                clear_screen()
-                manager.switch_to(EndWindow(manager))
-
-        keys = pygame.key.get_pressed()
-
-        if (not self.player.inventory.is_visible) and (not any([sprite.furnace_interface.is_visible for sprite in forge_group])):
-            direction = {
-                'left': keys[pygame.K_LEFT] or keys[pygame.K_a],
-                'right': keys[pygame.K_RIGHT] or keys[pygame.K_d],
-                'up': keys[pygame.K_UP] or keys[pygame.K_w],
-                'down': keys[pygame.K_DOWN] or keys[pygame.K_s]
-            }
 
-            self.player.move_self(direction)
-        else:
-            self.player.stop_moving()
+class GameScene(BaseGameScene):
+    level_file = 'main_level.txt'
 
-    def update(self, screen):
-        from scripts.utils import (
-            tiles_group,
-            all_sprites,
-            grount_group,
-            water_group,
-            resource_group,
-            resource_bars_group,
-            exp_bar_group,
-            inventory_group,
-            stars_group,
-            forge_group,
-            furnace_interface_group
-        )
-        from scripts.objects.objects import generate_resource
-        from scripts.objects.player import player_group
-
-        screen.fill(pygame.Color(56, 152, 255))
-        tiles_group.draw(screen)
-
-        while len(resource_group) < 10:
-            generate_resource()
-
-        water_group.draw(screen)
-        grount_group.draw(screen)
-
-        resource_group.draw(screen)
-        resource_group.update()
-
-        resource_bars_group.draw(screen)
-
-        player_group.draw(screen)
-        player_group.update()
-
-        exp_bar_group.draw(screen)
-        exp_bar_group.update(self.player.experience)
+    def handle_key(self, key):
+        super().handle_key(key)
+        if key == pygame.K_p and self.player.level >= 5:
+            clear_screen(self.world)
+            self.manager.switch_to(
+                LoadingWindow(self.manager, GameSceneV2(self.manager)))
 
-        stars_group.draw(screen)
-        stars_group.update()
 
-        forge_group.draw(screen)
-        forge_group.update()
+class GameSceneV2(BaseGameScene):
+    level_file = 'map_with_furnace.txt'
 
-        inventory_group.draw(screen)
-        inventory_group.update()
+    def __init__(self, manager, level=None, resource_count=10):
+        super().__init__(manager, level, resource_count)
+        # одно окно на все печи уровня
+        self.furnace_interface = None
 
-        furnace_interface_group.draw(screen)
-        furnace_interface_group.update()
+    def prepare(self):
+        yield from super().prepare()
+        if self.furnace_interface is None:
+            self.furnace_interface = FurnaceInterface(
+                *self.screen.get_size())
 
-        self.camera.update(self.player)
+    def ui_open(self):
+        return super().ui_open() or self.furnace_interface.is_visible
 
-        for sprite in all_sprites:
-            self.camera.apply(sprite)
+    def handle_key(self, key):
+        super().handle_key(key)
+        if key == pygame.K_f:
+            furnace = self.player.furnace()
+            if furnace is not None:
+                self.furnace_interface.toggle(
+                    furnace.smelter, self.player.inventory)
 
-        if self.player.health == 0:
-            manager.running = False
+    def update_objects(self):
+        # печи плавят по своим очередям
+        self.world.update_smelters(self.manager.dt)
+        self.furnace_interface.handle_click(*self.manager.get_mouse())
 
-    def draw(self):
-        self.screen.blit(self.background, (0, 0))
-        self.entities.draw(self.screen)
-        self.player.draw(self.screen)
+    def update_ui(self):
+        super().update_ui()
+        furnace_interface_group.update()
 
 
-def clear_screen():
-    from scripts.utils import all_sprites
+def prepare_game(scene):
+    """Подготовка игровой сцены по шагам: уровень, картинки, мир и чанки
+    у камеры. Выдаёт долю готовности; после готовности ничего не делает"""
+    if scene.ready:
+        return
+
+    if scene.level is None:
+        level = load_level(scene.level_file)
+        save = None
+        if scene.manager.persist_world:
+            save = WorldSave(save_path(scene.level_file))
+    else:
+        level, save = scene.level, None
+    yield 0.1
+
+    for done in preload_assets(level):
+        yield 0.1 + 0.3 * done
+
+    scene.player, x, y = generate_level(level)
+    scene.world = World(level, tiles_group.sprite, scene.player.inventory,
+                        save=save)
+    scene.spawner = scene.world.spawner
+
+    scene.camera = Camera(*scene.screen.get_size())
+    scene.camera.snap(scene.player)
+    yield 0.5
+
+    for done in scene.world.update_steps(*scene.stream_view()):
+        yield 0.5 + 0.25 * done
+
+    # графы поиска пути загруженных чанков, чтобы первый клик их не строил
+    navigator = scene.world.navigator
+    total = len(navigator.pending)
+    while navigator.pending:
+        left = navigator.build()
+        yield 0.75 + 0.1 * (1 - left / total)
+
+    # запекаем видимые чанки, чтобы первый кадр сцены не делал этого сам
+    tilemap = tiles_group.sprite
+    chunks = list(tilemap.visible_chunks(scene.camera.view_rect))
+    for i, (cx, cy) in enumerate(chunks, 1):
+        tilemap.get_chunk(cx, cy)
+        yield 0.85 + 0.15 * i / len(chunks)
+
+    scene.ready = True
+
+
+def clear_screen(world=None):
+    # мир сохраняем до того, как его ресурсы будут убраны
+    if world is not None:
+        world.close()
+    flush_all()
+    particle_system.clear()
 
     for sprite in all_sprites:
         sprite.kill()
 
-    screen.fill(pygame.Color(56, 152, 255))
-    pygame.display.flip()
+    # ресурсы и панели интерфейса не входят в all_sprites
+    resource_group.empty()
+    inventory_group.empty()
+    furnace_interface_group.empty()
+
+    if display.is_open:
+        display.surface.fill(WATER_COLOR)
+        pygame.display.flip()
 
 
 if __name__ == '__main__':
-    pygame.init()
-    screen = pygame.display.set_mode((800, 600))
-    manager = SceneManager(screen)
+    screen = display.open((WIDTH, HEIGHT))
+    manager = SceneManager(screen, dirty_rects='--dirty-rects' in sys.argv)
+    if '--metrics' in sys.argv[:-1]:
+        manager.metrics.export(sys.argv[sys.argv.index('--metrics') + 1])
+    if '--record' in sys.argv[:-1]:
+        seed = random.randrange(2 ** 32)
+        if '--seed' in sys.argv[:-1]:
+            seed = int(sys.argv[sys.argv.index('--seed') + 1])
+        manager.record(sys.argv[sys.argv.index('--record') + 1], seed)
     manager.switch_to(MainMenu(manager))
     manager.run()
-    pygame.quit()
+
+    manager.close()
+    manager.metrics.close()
+    flush_all()
+    display.close()
@@ -0,0 +1,186 @@
+"""Рецепты и плавка.
+
+Рецепты описаны в data/recipes.json. RecipeBook индексирует их по
+ингредиентам, поэтому при изменении инвентаря пересчитываются только
+рецепты с изменившимися предметами. Плавка - очередь заданий печи,
+которая идёт по времени симуляции, открыт интерфейс или нет.
+"""
+import json
+from collections import deque
+
+RECIPES_PATH = 'data/recipes.json'
+
+
+class Recipe:
+    """Рецепт: строка таблицы data/recipes.json"""
+
+    __slots__ = ('name', 'station', 'inputs', 'outputs', 'time')
+
+    def __init__(self, name, station, inputs, outputs, time):
+        self.name = name
+        # где делается рецепт: furnace - в печи
+        self.station = station
+        self.inputs = inputs
+        self.outputs = outputs
+        # секунд симуляции на одну единицу
+        self.time = time
+
+    def times(self, items):
+        """Сколько раз рецепт можно сделать из items"""
+        return min(items.get(item, 0) // count
+                   for item, count in self.inputs.items())
+
+
+class RecipeBook:
+    def __init__(self, recipes):
+        self.recipes = recipes
+        # предмет -> рецепты, в которые он входит
+        self.by_ingredient = {}
+        for recipe in recipes.values():
+            for item in recipe.inputs:
+                self.by_ingredient.setdefault(item, []).append(recipe)
+
+    def station(self, station):
+        return [recipe for recipe in self.recipes.values()
+                if recipe.station == station]
+
+    def affected(self, items):
+        """Рецепты, в которые входит хоть один из items"""
+        recipes = {}
+        for item in items:
+            for recipe in self.by_ingredient.get(item, ()):
+                recipes[recipe.name] = recipe
+        return recipes.values()
+
+
+def load_recipes(path=RECIPES_PATH):
+    with open(path, 'r') as f:
+        table = json.load(f)
+    return RecipeBook({
+        name: Recipe(name, **spec) for name, spec in table.items()
+    })
+
+
+_recipe_book = None
+
+
+def get_recipe_book():
+    """Книга рецептов; таблица читается при первом обращении"""
+    global _recipe_book
+    if _recipe_book is None:
+        _recipe_book = load_recipes()
+    return _recipe_book
+
+
+class Craftable:
+    """Сколько раз можно сделать каждый рецепт из инвентаря.
+
+    update() получает изменившиеся предметы и пересчитывает только
+    рецепты с ними; version растёт, когда меняется хоть одно число.
+    """
+
+    def __init__(self, items, book=None):
+        if book is None:
+            book = get_recipe_book()
+        self.book = book
+        self.counts = {
+            name: recipe.times(items) for name, recipe in book.recipes.items()
+        }
+        self.version = 0
+
+    def update(self, items, changed):
+        for recipe in self.book.affected(changed):
+            count = recipe.times(items)
+            if count != self.counts[recipe.name]:
+                self.counts[recipe.name] = count
+                self.version += 1
+
+    def get(self, recipe):
+        return self.counts[recipe.name]
+
+
+class Smelter:
+    """Очередь плавки одной печи.
+
+    Ингредиенты списываются при постановке в очередь, готовые предметы
+    попадают в инвентарь того, кто поставил задание.
+    """
+
+    def __init__(self):
+        # задания [рецепт, осталось единиц, инвентарь]
+        self.jobs = deque()
+        # секунд, проплавленных для текущей единицы
+        self.progress = 0.0
+        # растёт при каждом изменении очереди
+        self.version = 0
+
+    def queue(self, recipe, count, inventory):
+        """Поставить до count единиц одной транзакцией; вернуть сколько
+        поставлено"""
+        count = min(count, inventory.craftable.get(recipe))
+        if count <= 0:
+            return 0
+
+        inventory.remove_items({
+            item: need * count for item, need in recipe.inputs.items()
+        })
+        last = self.jobs[-1] if self.jobs else None
+        if last is not None and last[0] is recipe and last[2] is inventory:
+            last[1] += count
+        else:
+            self.jobs.append([recipe, count, inventory])
+        self.version += 1
+        return count
+
+    def update(self, dt):
+        while self.jobs:
+            job = self.jobs[0]
+            recipe, _, inventory = job
+            if self.progress + dt < recipe.time:
+                self.progress += dt
+                return
+
+            dt -= recipe.time - self.progress
+            self.progress = 0.0
+            job[1] -= 1
+            if job[1] == 0:
+                self.jobs.popleft()
+            inventory.add_items(recipe.outputs)
+            self.version += 1
+
+    def to_state(self):
+        """Очередь для снимка мира: (прогресс, [(рецепт, единиц)])"""
+        return self.progress, [
+            (recipe.name, count) for recipe, count, _ in self.jobs
+        ]
+
+    @classmethod
+    def from_state(cls, state, inventory, book=None):
+        """Очередь из to_state(); готовое попадёт в inventory.
+
+        Рецепты, которых больше нет в книге, пропускаются.
+        """
+        if book is None:
+            book = get_recipe_book()
+        progress, jobs = state
+
+        smelter = cls()
+        for name, count in jobs:
+            recipe = book.recipes.get(name)
+            if recipe is not None and count > 0:
+                smelter.jobs.append([recipe, count, inventory])
+        # прогресс относится к первому заданию - если оно пропало, сначала
+        if smelter.jobs and smelter.jobs[0][0].name == jobs[0][0]:
+            smelter.progress = progress
+        return smelter
+
+    @property
+    def fraction(self):
+        """Готовность текущей единицы от 0 до 1"""
+        if not self.jobs:
+            return 0.0
+        return self.progress / self.jobs[0][0].time
+
+    @property
+    def queued(self):
+        return sum(count for _, count, _ in self.jobs)
@@ -0,0 +1,76 @@
+import pygame
+
+
+class DirtyTracker:
+    """Сравнивает списки отрисовки соседних кадров и находит изменившиеся области"""
+
+    def __init__(self, screen_rect):
+        self.screen_rect = pygame.Rect(screen_rect)
+        # ключ -> (изображение, прозрачность, область на экране)
+        self.items = {}
+        self.view = None
+        self.full = True
+
+    def reset(self):
+        """Следующий кадр перерисовать целиком"""
+        self.items = {}
+        self.view = None
+        self.full = True
+
+    def collect(self, items, view):
+        """Список изменившихся областей или None, если нужен полный кадр.
+
+        items - (ключ, изображение, rect на экране), view - положение
+        камеры: при прокрутке меняется весь экран.
+        """
+        current = {}
+        for key, image, rect in items:
+            current[key] = (
+                image,
+                image.get_alpha(),
+                pygame.Rect(rect.topleft, image.get_size())
+            )
+
+        previous = self.items
+        self.items = current
+
+        if self.full or view != self.view:
+            self.full = False
+            self.view = view
+            return None
+
+        dirty = []
+        for key, state in current.items():
+            old = previous.get(key)
+            if old is None:
+                dirty.append(state[2])
+            elif old[0] is not state[0] or old[1] != state[1] or old[2] != state[2]:
+                dirty.append(old[2])
+                dirty.append(state[2])
+
+        for key, old in previous.items():
+            if key not in current:
+                dirty.append(old[2])
+
+        return merge_rects([
+            rect.clip(self.screen_rect) for rect in dirty
+            if rect.colliderect(self.screen_rect)
+        ])
+
+
+def merge_rects(rects):
+    """Склеить пересекающиеся области. Далёкие друг от друга остаются
+    отдельными, чтобы не перерисовывать всё, что между ними"""
+    merged = []
+    for rect in rects:
+        rect = rect.copy()
+        i = 0
+        while i < len(merged):
+            if merged[i].colliderect(rect):
+                rect.union_ip(merged.pop(i))
+                # выросшая область могла задеть уже проверенные
+                i = 0
+            else:
+                i += 1
+        merged.append(rect)
+    return merged
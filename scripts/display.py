@@ -0,0 +1,40 @@
+import sys
+
+import pygame
+
+# Constants
+FPS = 60
+WIDTH = 800
+HEIGHT = 640
+
+
+class Display:
+    """Окно игры и общие часы; окно создаётся один раз при open()"""
+
+    def __init__(self):
+        self.surface = None
+        self.clock = None
+
+    @property
+    def is_open(self):
+        return self.surface is not None
+
+    def open(self, size=(WIDTH, HEIGHT), flags=0):
+        if self.surface is None:
+            pygame.init()
+            self.surface = pygame.display.set_mode(size, flags)
+            self.clock = pygame.time.Clock()
+        return self.surface
+
+    def close(self):
+        self.surface = None
+        self.clock = None
+        pygame.quit()
+
+
+display = Display()
+
+
+def terminate():
+    display.close()
+    sys.exit()
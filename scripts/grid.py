@@ -0,0 +1,50 @@
+"""Операции над булевыми сетками клеток (NumPy)"""
+import numpy as np
+
+
+def label(mask):
+    """Связные области булева массива (4-соседство).
+
+    Возвращает метки клеток (0 - фон, области с 1) и число областей.
+    Клетки собираются в отрезки по строкам, отрезки соседних строк
+    сливаются, если перекрываются.
+    """
+    height, width = mask.shape
+    padded = np.zeros((height, width + 2), np.int8)
+    padded[:, 1:-1] = mask
+    edges = np.diff(padded, axis=1)
+    rows, starts = np.nonzero(edges == 1)
+    _, ends = np.nonzero(edges == -1)
+    count = len(rows)
+    if not count:
+        return np.zeros(mask.shape, np.int32), 0
+
+    # для отрезка строки r - отрезки строки r - 1, которые он перекрывает
+    stride = width + 1
+    start_keys = rows * stride + starts
+    end_keys = rows * stride + ends
+    above = (rows - 1) * stride
+    first = np.searchsorted(end_keys, above + starts, side='right')
+    last = np.searchsorted(start_keys, above + ends, side='left')
+    links = np.maximum(last - first, 0)
+    lower = np.repeat(np.arange(count), links)
+    upper = np.arange(links.sum()) - np.repeat(np.cumsum(links) - links, links)
+    upper += np.repeat(first, links)
+
+    # корень каждого отрезка - наименьший номер в его области
+    parent = np.arange(count)
+    while True:
+        a, b = parent[lower], parent[upper]
+        if np.array_equal(a, b):
+            break
+        np.minimum.at(parent, np.maximum(a, b), np.minimum(a, b))
+        while True:
+            jumped = parent[parent]
+            if np.array_equal(jumped, parent):
+                break
+            parent = jumped
+
+    roots, run_labels = np.unique(parent, return_inverse=True)
+    labels = np.zeros(height * width, np.int32)
+    labels[mask.ravel()] = np.repeat(run_labels + 1, ends - starts)
+    return labels.reshape(mask.shape), len(roots)
@@ -0,0 +1,179 @@
+"""Компактный двоичный формат уровней.
+
+Текстовая карта из levels/ компилируется в файл: заголовок, координаты
+печей и сетка по байту на клетку (символ карты). Файл открывается через
+mmap и читается как массив NumPy без разбора строк.
+
+Запуск: python -m scripts.levels levels/main_level.txt ...
+"""
+import mmap
+import os
+import struct
+import sys
+import tempfile
+
+import numpy as np
+
+from scripts.metrics import io_counts
+
+LEVELS_DIR = 'levels'
+# скомпилированные уровни; пересобираются при изменении исходника
+CACHE_DIR = os.path.join(LEVELS_DIR, '.cache')
+
+MAGIC = b'SLVL'
+VERSION = 1
+# магия, версия, ширина, высота, клетка игрока (-1 - нет),
+# число печей, mtime исходника в наносекундах
+HEADER = struct.Struct('<4sHIIiiIq')
+FURNACE = struct.Struct('<II')
+
+# клетка за пределами карты
+OUTSIDE = '#'
+
+
+class Level:
+    """Сетка уровня: grid[строка, столбец] - код символа клетки"""
+
+    def __init__(self, grid, spawn=None, furnaces=(), source_mtime=0):
+        self.grid = grid
+        self.rows, self.cols = grid.shape
+        self.spawn = spawn
+        self.furnaces = list(furnaces)
+        self.source_mtime = source_mtime
+        # отображение файла держится, пока жива сетка
+        self.buffer = None
+
+    @classmethod
+    def from_rows(cls, rows, source_mtime=0):
+        """Уровень из списка строк; короткие строки дополняются водой"""
+        width = max(map(len, rows)) if rows else 0
+        data = ''.join(row.ljust(width, OUTSIDE) for row in rows)
+        grid = np.frombuffer(data.encode('ascii'), np.uint8)
+        grid = grid.reshape(len(rows), width)
+
+        spawn = None
+        players = np.argwhere(grid == ord('@'))
+        if len(players):
+            # как и раньше, при нескольких '@' побеждает последний
+            y, x = players[-1].tolist()
+            spawn = (x, y)
+
+        furnaces = [(x, y) for y, x in np.argwhere(grid == ord('+')).tolist()]
+        return cls(grid, spawn, furnaces, source_mtime)
+
+    def __len__(self):
+        return self.rows
+
+    def __getitem__(self, row):
+        # совместимость со старым представлением - списком строк
+        return self.grid[row].tobytes().decode('ascii')
+
+    def __iter__(self):
+        for row in range(self.rows):
+            yield self[row]
+
+    def to_bytes(self):
+        spawn = self.spawn or (-1, -1)
+        header = HEADER.pack(MAGIC, VERSION, self.cols, self.rows,
+                             spawn[0], spawn[1], len(self.furnaces),
+                             self.source_mtime)
+        furnaces = b''.join(FURNACE.pack(x, y) for x, y in self.furnaces)
+        return header + furnaces + np.ascontiguousarray(self.grid).tobytes()
+
+
+def read_text(path):
+    io_counts['opens'] += 1
+    with open(path, 'r') as f:
+        return [line.strip() for line in f]
+
+
+def write_level(level, path):
+    """Атомарная запись скомпилированного уровня"""
+    folder = os.path.dirname(path) or '.'
+    os.makedirs(folder, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=folder, prefix='.tmp-', suffix='.lvl')
+    io_counts['opens'] += 1
+    io_counts['writes'] += 1
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(level.to_bytes())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def compile_level(source, target):
+    mtime = os.stat(source).st_mtime_ns
+    level = Level.from_rows(read_text(source), mtime)
+    write_level(level, target)
+    return level
+
+
+def read_header(buffer):
+    if len(buffer) < HEADER.size:
+        raise ValueError('level file is truncated')
+
+    magic, version, cols, rows, sx, sy, furnace_count, mtime = \
+        HEADER.unpack_from(buffer)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError('not a compiled level')
+
+    return cols, rows, sx, sy, furnace_count, mtime
+
+
+def open_level(path):
+    """Скомпилированный уровень, отображённый в память"""
+    io_counts['opens'] += 1
+    with open(path, 'rb') as f:
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    cols, rows, sx, sy, furnace_count, mtime = read_header(buffer)
+    offset = HEADER.size
+    furnaces = [
+        FURNACE.unpack_from(buffer, offset + i * FURNACE.size)
+        for i in range(furnace_count)
+    ]
+    offset += furnace_count * FURNACE.size
+
+    if len(buffer) < offset + rows * cols:
+        raise ValueError('level file is truncated')
+
+    grid = np.frombuffer(buffer, np.uint8, rows * cols, offset)
+    level = Level(grid.reshape(rows, cols),
+                  (sx, sy) if sx >= 0 else None, furnaces, mtime)
+    level.buffer = buffer
+    return level
+
+
+def cache_path(source):
+    name = os.path.splitext(os.path.basename(source))[0]
+    return os.path.join(CACHE_DIR, name + '.lvl')
+
+
+def load_level(filename):
+    """Уровень из levels/: скомпилированный из кэша, если исходник не менялся"""
+    source = os.path.join(LEVELS_DIR, filename)
+    target = cache_path(source)
+    mtime = os.stat(source).st_mtime_ns
+
+    try:
+        level = open_level(target)
+        if level.source_mtime == mtime:
+            return level
+    except (OSError, ValueError):
+        pass
+
+    try:
+        compile_level(source, target)
+        return open_level(target)
+    except OSError:
+        # каталог кэша недоступен для записи - обходимся без него
+        return Level.from_rows(read_text(source), mtime)
+
+
+if __name__ == '__main__':
+    for path in sys.argv[1:]:
+        level = compile_level(path, cache_path(path))
+        print(f'{path}: {level.cols}x{level.rows} -> {cache_path(path)}')
@@ -0,0 +1,230 @@
+"""Замеры кадра: время этапов, размеры групп, запросы к сетке и файлы.
+
+Каждый кадр складывается в запись; запись можно выгружать в JSONL или
+CSV (python main.py --metrics out.jsonl) и показывать оверлеем (F3).
+"""
+import csv
+import json
+import time
+
+import pygame
+
+from scripts.utils import (
+    all_sprites,
+    tiles_group,
+    resource_group,
+    exp_bar_group,
+    inventory_group,
+    forge_group,
+    furnace_interface_group,
+    collision_grid,
+    get_font,
+    transparent_surface
+)
+
+# этапы кадра в порядке выполнения
+UPDATE_STAGES = ('world', 'resources', 'player', 'camera', 'ui', 'particles')
+DRAW_STAGES = ('draw_items', 'tiles', 'sprites', 'flip')
+STAGES = UPDATE_STAGES + DRAW_STAGES
+
+GROUPS = {
+    'all_sprites': all_sprites,
+    'tiles': tiles_group,
+    'resources': resource_group,
+    'exp_bar': exp_bar_group,
+    'inventory': inventory_group,
+    'forge': forge_group,
+    'furnace_interface': furnace_interface_group,
+}
+
+FIELDS = (
+    ('frame', 'time', 'fps', 'steps')
+    + tuple(f'{stage}_ms' for stage in STAGES)
+    + tuple(f'{name}_count' for name in GROUPS)
+    + ('particles_count', 'collision_queries', 'file_opens', 'file_writes')
+)
+
+# открытия и записи файлов за всё время; увеличивают storage, levels, world
+io_counts = {'opens': 0, 'writes': 0}
+
+# как часто перерисовывать оверлей, в секундах
+OVERLAY_INTERVAL = 0.25
+OVERLAY_COLOR = (255, 255, 255)
+OVERLAY_BACKGROUND = (0, 0, 0, 160)
+OVERLAY_FONT_SIZE = 20
+
+
+class Stage:
+    """Контекстный менеджер, прибавляющий своё время к этапу"""
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        times = self.metrics.times
+        times[self.name] += time.perf_counter() - self.start
+
+
+class FrameMetrics:
+    def __init__(self):
+        self.frame = 0
+        self.steps = 0
+        self.times = dict.fromkeys(STAGES, 0.0)
+        self.stages = {name: Stage(self, name) for name in STAGES}
+
+        self.last_queries = collision_grid.queries
+        self.last_io = dict(io_counts)
+
+        self.particles = None
+        self.exporter = None
+        self.last = None
+
+    def stage(self, name):
+        return self.stages[name]
+
+    def step(self):
+        self.steps += 1
+
+    def export(self, path):
+        self.exporter = MetricsExporter(path)
+
+    def end_frame(self, fps):
+        """Закрыть кадр: собрать запись, выгрузить её и обнулить счётчики"""
+        record = {
+            'frame': self.frame,
+            'time': round(time.time(), 3),
+            'fps': round(fps, 2),
+            'steps': self.steps,
+        }
+        for name in STAGES:
+            record[f'{name}_ms'] = round(self.times[name] * 1000, 4)
+        for name, group in GROUPS.items():
+            record[f'{name}_count'] = len(group)
+        record['particles_count'] = (
+            len(self.particles) if self.particles is not None else 0)
+
+        record['collision_queries'] = (
+            collision_grid.queries - self.last_queries)
+        record['file_opens'] = io_counts['opens'] - self.last_io['opens']
+        record['file_writes'] = io_counts['writes'] - self.last_io['writes']
+
+        if self.exporter is not None:
+            self.exporter.write(record)
+
+        self.last = record
+        self.frame += 1
+        self.steps = 0
+        for name in STAGES:
+            self.times[name] = 0.0
+        self.last_queries = collision_grid.queries
+        self.last_io = dict(io_counts)
+
+        return record
+
+    def close(self):
+        if self.exporter is not None:
+            self.exporter.close()
+            self.exporter = None
+
+
+class MetricsExporter:
+    """Запись кадров в JSONL или, для файлов .csv, в CSV"""
+
+    def __init__(self, path):
+        self.file = open(path, 'w', newline='')
+        self.writer = None
+        if path.endswith('.csv'):
+            self.writer = csv.DictWriter(self.file, FIELDS)
+            self.writer.writeheader()
+
+    def write(self, record):
+        if self.writer is not None:
+            self.writer.writerow(record)
+        else:
+            self.file.write(json.dumps(record) + '\n')
+
+    def close(self):
+        self.file.close()
+
+
+class PerfOverlay:
+    """Оверлей с замерами: средние за OVERLAY_INTERVAL секунд.
+
+    Прижат левым нижним углом к pos, чтобы не закрывать сердца и опыт.
+    """
+
+    def __init__(self, pos):
+        self.visible = False
+        self.pos = pos
+        self.image = None
+        self.rect = pygame.Rect(pos, (0, 0))
+
+        self.records = []
+        self.updated = 0.0
+
+    def toggle(self):
+        self.visible = not self.visible
+        self.records = []
+        self.updated = 0.0
+
+    def add(self, record):
+        if not self.visible:
+            return
+
+        self.records.append(record)
+        now = time.perf_counter()
+        if self.image is None or now - self.updated >= OVERLAY_INTERVAL:
+            self.updated = now
+            self.image = self.render(self.records)
+            self.rect = self.image.get_rect(bottomleft=self.pos)
+            self.records = []
+
+    def lines(self, records):
+        count = len(records)
+
+        def mean(key):
+            return sum(record[key] for record in records) / count
+
+        last = records[-1]
+        return [
+            f"FPS {last['fps']:.1f}  steps {mean('steps'):.1f}",
+            'update ' + '  '.join(
+                f"{name} {mean(f'{name}_ms'):.2f}" for name in UPDATE_STAGES),
+            'draw ' + '  '.join(
+                f"{name} {mean(f'{name}_ms'):.2f}" for name in DRAW_STAGES),
+            'sprites ' + '  '.join(
+                f"{name} {last[f'{name}_count']}"
+                for name in ('all_sprites', 'resources', 'forge', 'particles')),
+            f"grid queries {mean('collision_queries'):.1f}  "
+            f"files opened {mean('file_opens'):.2f} "
+            f"written {mean('file_writes'):.2f}",
+        ]
+
+    def render(self, records):
+        font = get_font(OVERLAY_FONT_SIZE)
+        texts = [
+            # числа меняются каждый раз - мимо кэша строк, чтобы не вытеснять его
+            font.render(line, True, OVERLAY_COLOR)
+            for line in self.lines(records)
+        ]
+        padding = 6
+        width = max(text.get_width() for text in texts) + padding * 2
+        height = sum(text.get_height() for text in texts) + padding * 2
+
+        image = transparent_surface((width, height))
+        image.fill(OVERLAY_BACKGROUND)
+        y = padding
+        for text in texts:
+            image.blit(text, (padding, y))
+            y += text.get_height()
+        return image
+
+    def items(self):
+        if not self.visible or self.image is None:
+            return []
+        return [(self, self.image, self.rect)]
@@ -0,0 +1,557 @@
+"""Поиск пути по клеткам уровня и движение игрока по нему.
+
+Navigator - иерархический поиск: уровень делится на кластеры
+CLUSTER x CLUSTER клеток, на общих границах соседних кластеров по сетке
+уровня (NumPy) находятся порталы - середины проходов. Порталы кластера
+считаются, когда World загружает его чанк, и больше не меняются, поэтому
+большой мир не разбирается целиком. Пути между порталами внутри
+кластера строятся в build() по несколько кластеров за шаг и хранятся,
+пока в кластере не появится или не пропадёт ресурс; сам поиск идёт по
+графу порталов загруженных кластеров. Готовые пути кэшируются.
+"""
+import heapq
+import math
+from collections import OrderedDict, deque
+
+import numpy as np
+
+from scripts.grid import label
+from scripts.objects.objects import tile_width, tile_height
+from scripts.objects.tilemap import WATER_CELLS
+from scripts.utils import resource_group
+
+# сторона кластера в клетках
+CLUSTER = 16
+# сколько путей держать в кэше
+PATH_CACHE_SIZE = 256
+# на сколько кластеров путь может отойти от start и goal; дальше - нет
+# пути, зато клик на недоступную клетку не перебирает весь мир
+SEARCH_MARGIN = 4
+# сколько шагов построения графов делать в build() за шаг симуляции:
+# шаг - соседи клеток кластера или поиск из одного портала, около 1-3 мс.
+# Число, а не время, чтобы воспроизведение не зависело от машины
+BUILD_STEPS = 1
+
+DIAGONAL = math.sqrt(2)
+# соседи клетки: (dx, dy, цена)
+STEPS = (
+    (1, 0, 1.0), (-1, 0, 1.0), (0, 1, 1.0), (0, -1, 1.0),
+    (1, 1, DIAGONAL), (1, -1, DIAGONAL), (-1, 1, DIAGONAL), (-1, -1, DIAGONAL),
+)
+
+# подойти к точке ближе, чем на столько пикселей, - значит дойти
+ARRIVE_DISTANCE = 6
+# без продвижения к точке столько секунд - путь брошен
+STUCK_TIME = 0.75
+# как часто бить ресурс, дойдя до него, в секундах
+MINE_INTERVAL = 0.3
+
+NO_KEYS = {'left': False, 'right': False, 'up': False, 'down': False}
+
+
+def octile(a, b):
+    dx, dy = abs(a[0] - b[0]), abs(a[1] - b[1])
+    return max(dx, dy) + (DIAGONAL - 1) * min(dx, dy)
+
+
+def runs(ok):
+    """Отрезки True одномерного массива: пары (начало, конец) включительно"""
+    edges = np.diff(np.concatenate(([0], ok.view(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1)
+    ends = np.flatnonzero(edges == -1) - 1
+    return zip(starts.tolist(), ends.tolist())
+
+
+class ClusterGraph:
+    """Пути между порталами одного кластера"""
+
+    def __init__(self, cells, portals):
+        # проходимая клетка кластера -> [(соседняя клетка, цена)]
+        self.cells = cells
+        # проходимые порталы кластера
+        self.portals = portals
+        # порталы, из которых ещё не искали; граф готов, когда пусто
+        self.todo = list(portals)
+        # портал -> [(другой портал, цена)]
+        self.edges = {}
+        # портал -> дерево кратчайших путей из него (клетка -> предыдущая)
+        self.trees = {}
+
+    def path(self, a, b):
+        return trace(self.trees[a], b)[::-1]
+
+
+def trace(prev, cell):
+    """Путь от cell до корня дерева prev"""
+    path = [cell]
+    while prev[cell] is not None:
+        cell = prev[cell]
+        path.append(cell)
+    return path
+
+
+class Navigator:
+    def __init__(self, level, size=CLUSTER):
+        self.size = size
+        self.grid = level.grid
+        self.cols, self.rows = level.cols, level.rows
+        self.water = np.frombuffer(WATER_CELLS.encode('ascii'), np.uint8)
+        # печь занимает 2 x 2 клетки; клетки печей по кластерам
+        self.furnace_cells = {}
+        for x, y in level.furnaces:
+            for cell in ((x, y), (x + 1, y), (x, y + 1), (x + 1, y + 1)):
+                self.furnace_cells.setdefault(
+                    self.cluster(*cell), []).append(cell)
+
+        # кластер -> проходимость его клеток по сетке уровня
+        self.masks = {}
+        # кластер -> {портал: [клетки по ту сторону границы]}
+        self.portals = {}
+        # клетки, занятые ресурсами
+        self.blocked = set()
+        # кластер -> номер версии; растёт при каждом изменении кластера
+        self.versions = {}
+        self.graphs = {}
+        # кластер -> сколько загруженных областей его задевают
+        self.loaded = {}
+        # загруженные кластеры без готового графа, по порядку:
+        # кластер -> недостроенный граф или None
+        self.pending = {}
+
+        self.cache = OrderedDict()
+        self.searches = 0
+
+    def cluster(self, x, y):
+        return x // self.size, y // self.size
+
+    def bounds(self, key):
+        x0, y0 = key[0] * self.size, key[1] * self.size
+        return x0, y0, min(x0 + self.size, self.cols), \
+            min(y0 + self.size, self.rows)
+
+    def in_map(self, key):
+        return (0 <= key[0] * self.size < self.cols
+                and 0 <= key[1] * self.size < self.rows)
+
+    def clusters_in(self, x0, y0, x1, y1):
+        """Кластеры, задевающие область клеток [x0, x1) x [y0, y1)"""
+        x0, y0 = max(x0, 0), max(y0, 0)
+        x1, y1 = min(x1, self.cols), min(y1, self.rows)
+        if x0 >= x1 or y0 >= y1:
+            return []
+        kx0, ky0 = self.cluster(x0, y0)
+        kx1, ky1 = self.cluster(x1 - 1, y1 - 1)
+        return [(kx, ky) for ky in range(ky0, ky1 + 1)
+                for kx in range(kx0, kx1 + 1)]
+
+    def add_area(self, x0, y0, x1, y1):
+        """Область загружена: маски и порталы её кластеров считаются
+        сразу, графы ставятся в очередь build()"""
+        for key in self.clusters_in(x0, y0, x1, y1):
+            self.loaded[key] = self.loaded.get(key, 0) + 1
+            self.cluster_portals(key)
+            self.invalidate(key)
+
+    def remove_area(self, x0, y0, x1, y1):
+        for key in self.clusters_in(x0, y0, x1, y1):
+            count = self.loaded[key] - 1
+            if count:
+                self.loaded[key] = count
+                continue
+            del self.loaded[key]
+            self.invalidate(key)
+
+    def build(self, limit=BUILD_STEPS):
+        """Достраивать графы из очереди, сделав до limit шагов; вернуть,
+        сколько кластеров осталось"""
+        while limit > 0 and self.pending:
+            key, graph = next(iter(self.pending.items()))
+            if graph is None:
+                graph = self.pending[key] = self.new_graph(key)
+                limit -= 1
+            while graph.todo and limit > 0:
+                self.add_tree(graph, graph.todo.pop())
+                limit -= 1
+            if not graph.todo:
+                del self.pending[key]
+                self.graphs[key] = graph
+        return len(self.pending)
+
+    def mask(self, key):
+        """Проходимость клеток кластера без учёта ресурсов; считается
+        по сетке уровня при первом обращении к кластеру"""
+        mask = self.masks.get(key)
+        if mask is None:
+            x0, y0, x1, y1 = self.bounds(key)
+            mask = ~np.isin(self.grid[y0:y1, x0:x1], self.water)
+            for x, y in self.furnace_cells.get(key, ()):
+                mask[y - y0, x - x0] = False
+            self.masks[key] = mask
+        return mask
+
+    def cluster_portals(self, key):
+        """Порталы кластера - середины проходов через его границы"""
+        portals = self.portals.get(key)
+        if portals is not None:
+            return portals
+
+        portals = {}
+        mask = self.mask(key)
+        x0, y0, x1, y1 = self.bounds(key)
+        for dx, dy in ((1, 0), (-1, 0), (0, 1), (0, -1)):
+            other = (key[0] + dx, key[1] + dy)
+            if not self.in_map(other):
+                continue
+            near = self.mask(other)
+            # крайний ряд клеток кластера и соседний ряд за границей;
+            # сосед найдёт на этой границе те же порталы
+            if dx:
+                ok = mask[:, -1 if dx > 0 else 0] & near[:, 0 if dx > 0 else -1]
+            else:
+                ok = mask[-1 if dy > 0 else 0, :] & near[0 if dy > 0 else -1, :]
+            for start, end in runs(ok):
+                i = (start + end) // 2
+                if dx:
+                    cell = (x1 - 1 if dx > 0 else x0, y0 + i)
+                else:
+                    cell = (x0 + i, y1 - 1 if dy > 0 else y0)
+                portals.setdefault(cell, []).append(
+                    (cell[0] + dx, cell[1] + dy))
+        self.portals[key] = portals
+        return portals
+
+    def is_passable(self, x, y):
+        if not (0 <= x < self.cols and 0 <= y < self.rows) \
+                or (x, y) in self.blocked:
+            return False
+        key = self.cluster(x, y)
+        return bool(self.mask(key)[y - key[1] * self.size,
+                                   x - key[0] * self.size])
+
+    def block(self, x, y):
+        """Ресурс занял клетку: пересчитать придётся только её кластер"""
+        self.blocked.add((x, y))
+        self.touch(x, y)
+
+    def unblock(self, x, y):
+        self.blocked.discard((x, y))
+        self.touch(x, y)
+
+    def touch(self, x, y):
+        self.invalidate(self.cluster(x, y))
+
+    def invalidate(self, key):
+        """Кластер изменился: старые пути через него недействительны,
+        граф загруженного кластера перестроит build()"""
+        self.versions[key] = self.versions.get(key, 0) + 1
+        self.graphs.pop(key, None)
+        if key in self.loaded:
+            self.pending[key] = None
+        else:
+            self.pending.pop(key, None)
+
+    def local_cells(self, key, extra=None):
+        """Соседи каждой проходимой клетки кластера (и клетки extra, даже
+        если она занята). По диагонали - только если обе соседние клетки
+        проходимы"""
+        x0, y0, _, _ = self.bounds(key)
+        free = {
+            (x0 + x, y0 + y) for y, x in np.argwhere(self.mask(key)).tolist()
+        }
+        free -= self.blocked
+        if extra is not None:
+            free.add(extra)
+
+        cells = {}
+        for x, y in free:
+            cells[x, y] = [
+                ((x + dx, y + dy), cost) for dx, dy, cost in STEPS
+                if (x + dx, y + dy) in free and not (
+                    dx and dy and ((x + dx, y) not in free
+                                   or (x, y + dy) not in free))
+            ]
+        return cells
+
+    def search(self, source, cells):
+        """Дейкстра из source по клеткам cells: цены и дерево путей"""
+        self.searches += 1
+        dist = {source: 0.0}
+        prev = {source: None}
+        heap = [(0.0, source)]
+        while heap:
+            d, cell = heapq.heappop(heap)
+            if d > dist[cell]:
+                continue
+            for other, cost in cells[cell]:
+                nd = d + cost
+                if nd < dist.get(other, math.inf):
+                    dist[other] = nd
+                    prev[other] = cell
+                    heapq.heappush(heap, (nd, other))
+        return dist, prev
+
+    def new_graph(self, key):
+        cells = self.local_cells(key)
+        return ClusterGraph(cells, [
+            portal for portal in self.cluster_portals(key) if portal in cells
+        ])
+
+    def add_tree(self, graph, portal):
+        dist, prev = self.search(portal, graph.cells)
+        graph.trees[portal] = prev
+        graph.edges[portal] = [
+            (other, dist[other]) for other in graph.portals
+            if other != portal and other in dist
+        ]
+
+    def graph(self, key):
+        """Готовый граф кластера; недостроенный достраивается сразу"""
+        graph = self.graphs.get(key)
+        if graph is not None:
+            return graph
+
+        graph = self.pending.pop(key, None) or self.new_graph(key)
+        while graph.todo:
+            self.add_tree(graph, graph.todo.pop())
+        self.graphs[key] = graph
+        return graph
+
+    def reach(self, cell):
+        """Поиск из cell по её кластеру"""
+        key = self.cluster(*cell)
+        cells = self.graph(key).cells
+        if cell not in cells:
+            cells = self.local_cells(key, extra=cell)
+        return self.search(cell, cells)
+
+    def window(self, start, goal):
+        """Кластеры, в которых ищется путь: вокруг start и goal с запасом"""
+        (ax, ay), (bx, by) = self.cluster(*start), self.cluster(*goal)
+        return (min(ax, bx) - SEARCH_MARGIN, min(ay, by) - SEARCH_MARGIN,
+                max(ax, bx) + SEARCH_MARGIN, max(ay, by) + SEARCH_MARGIN)
+
+    def searchable(self, key, start, goal):
+        """Можно ли вести путь через кластер: он загружен (его граф уже
+        построен или строится в build()) или в нём начало или конец"""
+        return key in self.loaded or key == self.cluster(*start) \
+            or key == self.cluster(*goal)
+
+    def connected(self, start, goal, window):
+        """Связаны ли клетки сушей в пределах окна по кластерам, где
+        ищется путь (ресурсы не в счёт). Разметка окна - NumPy, быстрее,
+        чем искать по графам, чтобы убедиться, что пути нет"""
+        kx0, ky0, kx1, ky1 = window
+        kx0, ky0 = max(kx0, 0), max(ky0, 0)
+        ox, oy = kx0 * self.size, ky0 * self.size
+        width = min((kx1 + 1) * self.size, self.cols) - ox
+        height = min((ky1 + 1) * self.size, self.rows) - oy
+        area = np.zeros((height, width), bool)
+        for ky in range(ky0, ky1 + 1):
+            for kx in range(kx0, kx1 + 1):
+                if self.in_map((kx, ky)) \
+                        and self.searchable((kx, ky), start, goal):
+                    x0, y0, x1, y1 = self.bounds((kx, ky))
+                    area[y0 - oy:y1 - oy, x0 - ox:x1 - ox] = self.mask((kx, ky))
+
+        labels, _ = label(area)
+        # клетка игрока может оказаться у самой воды - тогда не проверяем
+        first = labels[start[1] - oy, start[0] - ox]
+        return not first or first == labels[goal[1] - oy, goal[0] - ox]
+
+    def find_path(self, start, goal):
+        """Клетки от start до goal включительно или None"""
+        # на клетке игрока мог появиться ресурс - её проходимость не важна
+        if not (0 <= start[0] < self.cols and 0 <= start[1] < self.rows
+                and self.is_passable(*goal)):
+            return None
+
+        key = (start, goal)
+        cached = self.cache.get(key)
+        if cached is not None:
+            path, versions = cached
+            if all(self.versions.get(c, 0) == v for c, v in versions):
+                self.cache.move_to_end(key)
+                return path and list(path)
+            del self.cache[key]
+
+        path = self.plan(start, goal)
+        if path is not None:
+            clusters = {self.cluster(*cell) for cell in path}
+        else:
+            # пути нет: он может появиться в любом кластере окна поиска
+            x0, y0, x1, y1 = self.window(start, goal)
+            clusters = [(x, y) for y in range(y0, y1 + 1)
+                        for x in range(x0, x1 + 1)]
+        self.cache[key] = (path, [
+            (c, self.versions.get(c, 0)) for c in clusters])
+        if len(self.cache) > PATH_CACHE_SIZE:
+            self.cache.popitem(last=False)
+        return path and list(path)
+
+    def find_path_to_any(self, start, goals):
+        """Путь до ближайшей (по прямой) из клеток goals, до которой он есть"""
+        for goal in sorted(goals, key=lambda cell: octile(start, cell)):
+            path = self.find_path(start, goal)
+            if path is not None:
+                return path
+        return None
+
+    def plan(self, start, goal):
+        goal_cluster = self.cluster(*goal)
+        x0, y0, x1, y1 = self.window(start, goal)
+        start_dist, start_prev = self.reach(start)
+        if goal in start_dist:
+            return trace(start_prev, goal)[::-1]
+        if not self.connected(start, goal, (x0, y0, x1, y1)):
+            return None
+        goal_dist, goal_prev = self.reach(goal)
+
+        def neighbours(node):
+            cluster = self.cluster(*node)
+            portals = self.cluster_portals(cluster)
+            if node == start:
+                for portal in portals:
+                    if portal != start and portal in start_dist:
+                        yield portal, start_dist[portal]
+            elif node in portals:
+                yield from self.graph(cluster).edges.get(node, ())
+            for other in portals.get(node, ()):
+                key = self.cluster(*other)
+                if x0 <= key[0] <= x1 and y0 <= key[1] <= y1 \
+                        and self.searchable(key, start, goal) \
+                        and self.is_passable(*other):
+                    yield other, 1.0
+            if cluster == goal_cluster and node in goal_dist:
+                yield goal, goal_dist[node]
+
+        # A* по графу порталов
+        came_from = {start: None}
+        cost = {start: 0.0}
+        heap = [(octile(start, goal), 0.0, start)]
+        while heap:
+            _, g, node = heapq.heappop(heap)
+            if node == goal:
+                break
+            if g > cost[node]:
+                continue
+            for other, step in neighbours(node):
+                ng = g + step
+                if ng < cost.get(other, math.inf):
+                    cost[other] = ng
+                    came_from[other] = node
+                    heapq.heappush(
+                        heap, (ng + octile(other, goal), ng, other))
+        else:
+            return None
+
+        nodes = trace(came_from, goal)[::-1]
+        path = [start]
+        for a, b in zip(nodes, nodes[1:]):
+            if self.cluster(*a) != self.cluster(*b):
+                segment = [a, b]
+            elif a == start:
+                segment = trace(start_prev, b)[::-1]
+            elif b == goal:
+                segment = trace(goal_prev, a)
+            else:
+                segment = self.graph(self.cluster(*a)).path(a, b)
+            path += segment[1:]
+        return path
+
+
+def cell_at(x, y):
+    return int(x // tile_width), int(y // tile_height)
+
+
+def cell_center(cell):
+    return (cell[0] + 0.5) * tile_width, (cell[1] + 0.5) * tile_height
+
+
+def around(cell, size=1):
+    """Клетки вплотную к сторонам квадрата size x size с углом в cell"""
+    x, y = cell
+    for i in range(size):
+        yield x + i, y - 1
+        yield x + i, y + size
+        yield x - 1, y + i
+        yield x + size, y + i
+
+
+def waypoints(path):
+    """Центры клеток пути, где он поворачивает, и последняя клетка"""
+    points = []
+    for i, cell in enumerate(path[1:], 1):
+        if i + 1 < len(path):
+            prev, nxt = path[i - 1], path[i + 1]
+            if (cell[0] - prev[0], cell[1] - prev[1]) == \
+                    (nxt[0] - cell[0], nxt[1] - cell[1]):
+                continue
+        points.append(cell_center(cell))
+    return deque(points)
+
+
+class Route:
+    """Движение игрока по пути, а в конце - к цели (ресурсу или печи).
+
+    update() выдаёт нажатия для Player.move_self, ресурс у цели бьёт
+    сам; None - маршрут закончен.
+    """
+
+    def __init__(self, path, target=None, mine=False):
+        self.points = waypoints(path)
+        self.target = target
+        # бить цель, дойдя до неё
+        self.mine = mine
+        self.mine_timer = 0.0
+
+        self.best = math.inf
+        self.stuck = 0.0
+
+    def update(self, player, dt):
+        x, y = player.x + player.rect.width / 2, player.y + player.rect.height / 2
+        if self.points:
+            tx, ty = self.points[0]
+            if abs(tx - x) <= ARRIVE_DISTANCE and abs(ty - y) <= ARRIVE_DISTANCE:
+                self.points.popleft()
+                self.best = math.inf
+                return self.update(player, dt)
+        elif self.target is not None:
+            if self.mine and self.target not in resource_group:
+                return None
+            if player.rect.colliderect(self.target.rect):
+                if not self.mine:
+                    return None
+                self.mine_timer -= dt
+                if self.mine_timer <= 0:
+                    self.mine_timer = MINE_INTERVAL
+                    player.hit()
+                return NO_KEYS
+            tx, ty = self.target.rect.center
+        else:
+            return None
+
+        # продвигаемся - сбрасываем счётчик, стоим на месте - бросаем путь
+        distance = abs(tx - x) + abs(ty - y)
+        if distance < self.best - 1:
+            self.best = distance
+            self.stuck = 0.0
+        else:
+            self.stuck += dt
+            if self.stuck > STUCK_TIME:
+                return None
+
+        left, right = self.axis(tx - x, player.pos_x)
+        up, down = self.axis(ty - y, player.pos_y)
+        return {'left': left, 'right': right, 'up': up, 'down': down}
+
+    @staticmethod
+    def axis(delta, speed):
+        """Нажатия по одной оси: к цели, а если иначе проскочим - тормозить.
+        Встречное нажатие гасит скорость на ACCELERATION (0.5) за шаг,
+        так что путь до остановки - примерно speed ** 2"""
+        if abs(delta) <= ARRIVE_DISTANCE / 2:
+            return False, False
+        towards = delta > 0
+        if speed and (speed > 0) == towards and speed * speed >= abs(delta):
+            towards = not towards
+        return not towards, towards
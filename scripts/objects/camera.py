@@ -1,25 +1,92 @@
-from scripts.objects.player import Heart, Player
+import math
+
+import pygame
+
+# доля пути до цели, которую камера проходила за кадр при 60 FPS,
+# пересчитанная в скорость сглаживания в секунду: -ln(1 - 0.084) * 60
+CAMERA_SMOOTHING = 5.26
+
+# запас вокруг экрана в пикселях: объекты в нём ещё рисуются и обновляются
+CULL_MARGIN = 100
 
 
 class Camera:
-    # зададим начальный сдвиг камеры
-    def __init__(self):
-        self.dx = 0
-        self.dy = 0
-
-    # сдвинуть объект obj на смещение камеры
-    def apply(self, obj):
-        if (not isinstance(obj, Player)) and (not isinstance(obj, Heart)):
-            obj.rect.x += int(self.dx * 0.084)
-            obj.rect.y += int(self.dy * 0.084)
-        elif isinstance(obj, Player):
-            obj.x += int(self.dx * 0.084)
-            obj.y += int(self.dy * 0.084)
-
-        # print(self.dx, self.dy)
-
-    # позиционировать камеру на объекте target
-
-    def update(self, target):
-        self.dx = -(target.x + target.rect.w // 2 - 800 // 2)
-        self.dy = -(target.y + target.rect.h // 2 - 600 // 2)
+    # зададим начальное положение камеры в мировых координатах
+    def __init__(self, width=800, height=600, smoothing=CAMERA_SMOOTHING):
+        self.width = width
+        self.height = height
+        self.smoothing = smoothing
+
+        self.x = 0.0
+        self.y = 0.0
+
+        # положение до последнего шага и доля шага для отрисовки
+        self.prev_x = 0.0
+        self.prev_y = 0.0
+        self.alpha = 1.0
+
+    @property
+    def offset(self):
+        x = self.prev_x + (self.x - self.prev_x) * self.alpha
+        y = self.prev_y + (self.y - self.prev_y) * self.alpha
+        return round(x), round(y)
+
+    def interpolate(self, alpha):
+        self.alpha = alpha
+
+    @property
+    def view_rect(self):
+        """Видимая часть мира"""
+        ox, oy = self.offset
+        return pygame.Rect(ox, oy, self.width, self.height)
+
+    def cull_rect(self, margin=CULL_MARGIN):
+        return self.view_rect.inflate(2 * margin, 2 * margin)
+
+    def visible(self, group, grid=None, margin=CULL_MARGIN):
+        """Спрайты group рядом с экраном.
+
+        Большую группу ищем по сетке grid, маленькую проще перебрать.
+        """
+        area = self.cull_rect(margin)
+        if grid is not None and len(group) > grid.cell_count(area):
+            return grid.query_rect(area, group)
+        return [sprite for sprite in group if sprite.rect.colliderect(area)]
+
+    # перевести прямоугольник из мировых координат в экранные
+    def apply(self, rect):
+        ox, oy = self.offset
+        return rect.move(-ox, -oy)
+
+    def pick(self, x, y):
+        """Точка мира под экранной точкой по положению камеры на последнем
+        шаге симуляции, без сглаживания отрисовки: так клик не зависит от
+        частоты кадров и одинаков при воспроизведении ввода"""
+        return x + round(self.x), y + round(self.y)
+
+    def goal(self, target):
+        return (target.x + target.rect.w / 2 - self.width / 2,
+                target.y + target.rect.h / 2 - self.height / 2)
+
+    # сразу навести камеру на target, без плавного подлёта
+    def snap(self, target):
+        self.x, self.y = self.prev_x, self.prev_y = self.goal(target)
+
+    # плавно подвести камеру к объекту target за dt секунд
+    def update(self, target, dt):
+        goal_x, goal_y = self.goal(target)
+
+        self.prev_x = self.x
+        self.prev_y = self.y
+
+        k = 1 - math.exp(-self.smoothing * dt)
+        self.x += (goal_x - self.x) * k
+        self.y += (goal_y - self.y) * k
+
+    def items(self, sprites):
+        """Список отрисовки спрайтов: (спрайт, изображение, rect на экране)"""
+        ox, oy = self.offset
+        return [
+            (sprite, sprite.image, sprite.rect.move(-ox, -oy))
+            for sprite in sprites
+        ]
@@ -1,46 +1,69 @@
-from scripts.objects.objects import Furnace, Tile
-from scripts.objects.player import Player
-
+import queue
+import threading
 
-def load_level(filename):
-    filename = "levels/" + filename
+from scripts.levels import Level, load_level  # noqa: F401
+from scripts.objects.objects import Furnace, get_resource_types
+from scripts.objects.player import Player
+from scripts.objects.tilemap import TileMap, tile_images
+from scripts.utils import is_image_loaded, preload_image, read_image
 
-    with open(filename, 'r') as mapFile:
-        level_map = [line.strip() for line in mapFile]
+# сколько ждать очередной файл от рабочего потока, прежде чем отдать шаг
+READ_WAIT = 0.002
 
-    max_width = max(map(len, level_map))
 
-    return list(map(lambda x: x.ljust(max_width, '#'), level_map))
+def generate_level(level):
+    if not isinstance(level, Level):
+        level = Level.from_rows(level)
 
+    # печи и ресурсы создаёт World по мере загрузки чанков
+    TileMap(level)
 
-def generate_level(level):
     new_player, x, y = None, None, None
-    for y in range(len(level)):
-        for x in range(len(level[y])):
-            if level[y][x] == '.':
-                Tile('empty', x, y, "grount_group")
-            elif level[y][x] == '#':
-                Tile('water', x, y, "water_group")
-            elif level[y][x] == '@':
-                Tile('empty', x, y, "grount_group")
-                new_player = Player(x, y)
-            elif level[y][x] == '+':
-                Tile('empty', x, y, "grount_group")
-                Furnace(x, y)
+    if level.spawn is not None:
+        x, y = level.spawn
+        new_player = Player(x, y)
 
     return new_player, x, y
 
 
-def update_level(player, level):
-    for y in range(len(level)):
-        for x in range(len(level[y])):
-            if level[y][x] == '.':
-                Tile('empty', x, y, "grount_group")
-            elif level[y][x] == '#':
-                Tile('water', x, y, "water_group")
-            elif level[y][x] == '@':
-                Tile('empty', x, y, "grount_group")
-                player.rect.x = x
-                player.rect.y = y
+def read_images(images, files):
+    """Рабочий поток preload_assets: декодирует файлы по порядку"""
+    for name, type_data, _, _ in images:
+        try:
+            files.put(read_image(name, type_data))
+        except BaseException as error:
+            files.put(error)
+            return
+
+
+def preload_assets(level):
+    """Картинки уровня заранее; выдаёт долю готовности.
+
+    Файлы декодирует рабочий поток, а здесь они по одной приводятся
+    к формату экрана, так что шаги остаются короткими.
+    """
+    images = [(name, '', None, None) for name in tile_images.values()]
+    if level.furnaces:
+        images.append(('furnace.png', '', -1, Furnace.size))
+    images += [
+        (kind.sprite, 'block', -1, kind.scale)
+        for kind in get_resource_types().values()
+    ]
+    images = [spec for spec in images if not is_image_loaded(*spec)]
+
+    files = queue.Queue()
+    threading.Thread(target=read_images, args=(images, files),
+                     name='image-reader', daemon=True).start()
+
+    for i, spec in enumerate(images):
+        while True:
+            try:
+                image = files.get(timeout=READ_WAIT)
+                break
+            except queue.Empty:
+                yield i / len(images)
+        if isinstance(image, BaseException):
+            raise image
 
-    return None
+        preload_image(image, *spec)
+        yield (i + 1) / len(images)
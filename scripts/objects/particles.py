@@ -0,0 +1,171 @@
+import numpy as np
+import pygame
+
+from scripts.rng import particle_random as rng
+from scripts.utils import load_image
+
+# наибольшая сторона картинки частицы: для отсечения за краем экрана
+MAX_PARTICLE_SIZE = 32
+
+
+class Emitter:
+    """Параметры одной вспышки частиц"""
+
+    def __init__(self, load_images, count, speed, gravity, lifetime, area):
+        # функция, возвращающая картинки, из которых случайно выбирается
+        # вид частицы; вызывается при первой вспышке
+        self.load_images = load_images
+        self._images = None
+        self.count = count
+        # скорости по каждой оси - целые числа из [speed[0], speed[1]]
+        self.speed = speed
+        self.gravity = gravity
+        # сколько шагов живёт частица
+        self.lifetime = lifetime
+        # полуразмеры области вокруг точки появления, за которой частица гибнет
+        self.area = area
+
+    @property
+    def images(self):
+        if self._images is None:
+            self._images = self.load_images()
+        return self._images
+
+
+class ParticleSystem:
+    """Все частицы в массивах NumPy: одно векторное обновление за шаг"""
+
+    def __init__(self, capacity=1024):
+        self.count = 0
+        self.images = []
+        self.image_index = {}
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        old = self.count
+        arrays = {
+            'pos': np.zeros((capacity, 2), np.float32),
+            'vel': np.zeros((capacity, 2), np.float32),
+            'origin': np.zeros((capacity, 2), np.float32),
+            'area': np.zeros((capacity, 2), np.float32),
+            'gravity': np.zeros(capacity, np.float32),
+            'life': np.zeros(capacity, np.int32),
+            'image': np.zeros(capacity, np.int32),
+        }
+        for name, array in arrays.items():
+            if old:
+                array[:old] = getattr(self, name)[:old]
+            setattr(self, name, array)
+        self.capacity = capacity
+
+    def __len__(self):
+        return self.count
+
+    def _image_ids(self, images):
+        ids = []
+        for image in images:
+            index = self.image_index.get(id(image))
+            if index is None:
+                index = self.image_index[id(image)] = len(self.images)
+                self.images.append(image)
+            ids.append(index)
+        return np.array(ids, np.int32)
+
+    def emit(self, emitter, position, count=None):
+        count = emitter.count if count is None else count
+        if self.count + count > self.capacity:
+            self._allocate(max(self.capacity * 2, self.count + count))
+
+        part = slice(self.count, self.count + count)
+        low, high = emitter.speed
+
+        self.pos[part] = position
+        self.origin[part] = position
+        self.vel[part] = rng.integers(low, high + 1, size=(count, 2))
+        self.area[part] = emitter.area
+        self.gravity[part] = emitter.gravity
+        self.life[part] = emitter.lifetime
+        self.image[part] = rng.choice(self._image_ids(emitter.images), count)
+
+        self.count += count
+
+    def update(self):
+        n = self.count
+        if not n:
+            return
+
+        vel = self.vel[:n]
+        pos = self.pos[:n]
+        life = self.life[:n]
+
+        vel[:, 1] += self.gravity[:n]
+        pos += vel
+        life -= 1
+
+        inside = np.abs(pos - self.origin[:n]) <= self.area[:n]
+        alive = (life > 0) & inside[:, 0] & inside[:, 1]
+        if alive.all():
+            return
+
+        # уплотняем живые частицы в начало массивов
+        keep = int(alive.sum())
+        for name in ('pos', 'vel', 'origin', 'area', 'gravity', 'life', 'image'):
+            array = getattr(self, name)
+            array[:keep] = array[:n][alive]
+        self.count = keep
+
+    def clear(self):
+        self.count = 0
+
+    def on_screen(self, camera):
+        """Индексы, картинки и экранные координаты видимых частиц"""
+        n = self.count
+        ox, oy = camera.offset
+        points = self.pos[:n] - (ox, oy)
+        inside = ((points[:, 0] > -MAX_PARTICLE_SIZE)
+                  & (points[:, 0] < camera.width)
+                  & (points[:, 1] > -MAX_PARTICLE_SIZE)
+                  & (points[:, 1] < camera.height))
+        index = np.nonzero(inside)[0]
+        return (index.tolist(), self.image[index].tolist(),
+                points[index].astype(np.int32).tolist())
+
+    def items(self, camera):
+        """Список отрисовки видимых частиц в экранных координатах"""
+        if not self.count:
+            return []
+
+        images = self.images
+        return [
+            ((self, i), images[kind], pygame.Rect(point, images[kind].get_size()))
+            for i, kind, point in zip(*self.on_screen(camera))
+        ]
+
+
+def star_images():
+    star = load_image("star.png", color_key=-1)
+
+    # сгенерируем частицы разного размера
+    return [star] * 20 + [
+        pygame.transform.scale(star, (scale, scale)) for scale in (5, 10, 20)
+    ]
+
+
+def debris_images():
+    return star_images()[-3:-1]
+
+
+LEVEL_UP = Emitter(star_images, count=60, speed=(-5, 5), gravity=0.35,
+                   lifetime=600, area=(432, 332))
+MINING_DEBRIS = Emitter(debris_images, count=12, speed=(-3, 3), gravity=0.35,
+                        lifetime=30, area=(200, 200))
+
+particle_system = ParticleSystem()
+
+
+def create_particles(position):
+    particle_system.emit(LEVEL_UP, position)
+
+
+def create_debris(position):
+    particle_system.emit(MINING_DEBRIS, position)
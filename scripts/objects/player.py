@@ -1,16 +1,23 @@
-import json
 import pygame
 
-from scripts.objects.objects import create_particles
+from scripts.crafting import Craftable
+from scripts.objects.particles import create_particles, create_debris
 from scripts.utils import (
     all_sprites,
-    water_group,
+    tiles_group,
     resource_group,
     exp_bar_group,
     inventory_group,
-    forge_group
+    forge_group,
+    collision_grid
 )
-from scripts.utils import load_image
+from scripts.utils import (
+    item_icon,
+    load_image,
+    render_text,
+    transparent_surface
+)
+from scripts.storage import JsonStore
 
 PLAYER_MAX_SPEED = 4.5
 FRICTION = 0.85
@@ -31,17 +38,19 @@ ICON_SIZE = 32
 
 tile_width = tile_height = 50
 
-player_image = load_image('player.png')
-player_heart_full = load_image('heart_full.png', color_key=-1)
-player_heart_empty = load_image('heart_empty.png', color_key=-1)
+inventory_store = JsonStore('data/player/inventory.json')
+stats_store = JsonStore('data/player/stats.json')
 
 player_group = pygame.sprite.Group()
+hearts_group = pygame.sprite.Group()
 
 
 class Inventory(pygame.sprite.Sprite):
     def __init__(self, screen_width, screen_height):
         super().__init__(inventory_group)
         self.inventory_dict = self.load_inventory()
+        # сколько раз можно сделать каждый рецепт из инвентаря
+        self.craftable = Craftable(self.inventory_dict)
         self.is_visible = False
         self.items_positions = {
             "wood": (0, 0),
@@ -58,71 +67,92 @@ class Inventory(pygame.sprite.Sprite):
         self.height = CELL_SIZE * INVENTORY_HEIGHT + \
             PADDING * (INVENTORY_HEIGHT + 1)
 
-        self.image = pygame.Surface(
-            (self.width, self.height))
+        # пустая картинка для скрытого инвентаря и кэш открытой панели
+        self.hidden_image = transparent_surface((self.width, self.height))
+        self.panel = None
+        # версия содержимого растёт при каждом изменении inventory_dict
+        self.version = 0
+        self.panel_version = -1
+
+        self.image = self.hidden_image
         self.rect = self.image.get_rect(
             center=(screen_width // 2, screen_height // 2))
 
         self.icons = {}
 
         for name in self.items_positions.keys():
-            if name.startswith("ore"):
-                self.icons[name] = load_image(f"ore/{name}.png")
-            elif name.startswith("ingot"):
-                self.icons[name] = load_image(f"ingot/{name}.png")
-            else:
-                self.icons[name] = load_image(f"{name}.png")
-
-        self.font = pygame.font.Font(None, 20)
+            self.icons[name] = item_icon(name)
 
     def update(self):
         if self.is_visible:
-            self.image = pygame.Surface(
-                (self.width, self.height), pygame.SRCALPHA)
+            if self.panel_version != self.version:
+                self.panel = self.render_panel()
+                self.panel_version = self.version
+            self.image = self.panel
+        else:
+            self.image = self.hidden_image
 
-            self.image.fill((0, 0, 0))
+    def render_panel(self):
+        panel = pygame.Surface((self.width, self.height), pygame.SRCALPHA)
 
-            pygame.draw.rect(self.image, BG_COLOR,
-                             (0, 0, self.width, self.height))
-            pygame.draw.rect(self.image, BORDER_COLOR,
-                             (0, 0, self.width, self.height), 2)
+        panel.fill((0, 0, 0))
 
-            for name, (x, y) in self.items_positions.items():
-                count = self.inventory_dict.get(name, 0)
-                if count > 0:
-                    pos_x = PADDING + x * (CELL_SIZE + PADDING)
-                    pos_y = PADDING + y * (CELL_SIZE + PADDING)
+        pygame.draw.rect(panel, BG_COLOR,
+                         (0, 0, self.width, self.height))
+        pygame.draw.rect(panel, BORDER_COLOR,
+                         (0, 0, self.width, self.height), 2)
 
-                    self.image.blit(self.icons[name], (pos_x + 4, pos_y + 4))
+        for name, (x, y) in self.items_positions.items():
+            count = self.inventory_dict.get(name, 0)
+            if count > 0:
+                pos_x = PADDING + x * (CELL_SIZE + PADDING)
+                pos_y = PADDING + y * (CELL_SIZE + PADDING)
 
-                    text = self.font.render(str(count), True, TEXT_COLOR)
-                    self.image.blit(
-                        text, (pos_x + CELL_SIZE - 15, pos_y + CELL_SIZE - 15))
+                panel.blit(self.icons[name], (pos_x + 4, pos_y + 4))
 
-        else:
-            self.image.set_alpha(0)
+                text = render_text(str(count), 20, TEXT_COLOR)
+                panel.blit(
+                    text, (pos_x + CELL_SIZE - 15, pos_y + CELL_SIZE - 15))
+
+        return panel
 
     def toggle_visibility(self):
         self.is_visible = not self.is_visible
 
     def add_item(self, item_type, amount=1):
-        if item_type in self.inventory_dict:
-            self.inventory_dict[item_type] += amount
-        else:
-            self.inventory_dict[item_type] = amount
+        self.add_items({item_type: amount})
 
-        with open("data/player/inventory.json", "w") as f:
-            json.dump(self.inventory_dict, f, ensure_ascii=False, indent=4)
+    def add_items(self, items):
+        for item_type, amount in items.items():
+            self.inventory_dict[item_type] = \
+                self.inventory_dict.get(item_type, 0) + amount
 
-    def load_inventory(self) -> dict:
-        with open("data/player/inventory.json", "r") as f:
-            data = json.load(f)
+        self.update_inventory(items)
+
+    def remove_items(self, items):
+        """Списать items целиком или ничего; вернуть, удалось ли"""
+        if any(self.inventory_dict.get(item_type, 0) < amount
+               for item_type, amount in items.items()):
+            return False
 
-        return data
+        for item_type, amount in items.items():
+            self.inventory_dict[item_type] -= amount
+            # Удаляем запись если количество 0
+            if self.inventory_dict[item_type] == 0:
+                del self.inventory_dict[item_type]
+
+        self.update_inventory(items)
+        return True
+
+    def load_inventory(self) -> dict:
+        return inventory_store.load()
 
-    def update_inventory(self):
-        with open("data/player/inventory.json", "w") as f:
-            json.dump(self.inventory_dict, f, ensure_ascii=False, indent=4)
+    def update_inventory(self, changed):
+        """Сообщить об изменении предметов changed: пересчитать рецепты,
+        перерисовать и сохранить"""
+        self.version += 1
+        self.craftable.update(self.inventory_dict, changed)
+        inventory_store.save(self.inventory_dict)
 
 
 class ExpBar(pygame.sprite.Sprite):
@@ -133,9 +163,17 @@ class ExpBar(pygame.sprite.Sprite):
         self.width = width
         self.height = height
         self.offset = offset
-        self.image = pygame.Surface([width, height])
+
+        # две заранее созданные поверхности: новая полоска рисуется
+        # во вторую, чтобы смена картинки была видна по ссылке на image
+        self.buffers = [
+            pygame.Surface([width, height]),
+            pygame.Surface([width, height])
+        ]
+        self.image = self.buffers[0]
         self.image.fill(BLUE)
         self.rect = self.image.get_rect()
+        self.drawn_width = None
 
     def update(self, parent_sprite):
         self.rect.midtop = self.offset
@@ -143,15 +181,13 @@ class ExpBar(pygame.sprite.Sprite):
         exp_ratio = self.current_exp / self.max_exp
 
         new_width = int(self.width * exp_ratio)
+        if new_width == self.drawn_width:
+            return
 
-        self.image = pygame.Surface([self.width, self.height])
-        self.image_bar = pygame.Surface([new_width, self.height])
-        self.image_bar.fill(BLUE)
-
-        pygame.draw.rect(self.image, BLACK,
-                         (0, 0, self.width, self.height), 1)
-
-        self.image.blit(self.image_bar, (0, 0))
+        self.image = self.buffers[self.buffers[0] is self.image]
+        self.image.fill(BLACK)
+        self.image.fill(BLUE, (0, 0, new_width, self.height))
+        self.drawn_width = new_width
 
     def add_exp(self, amount) -> 0 | 1:
         self.current_exp += amount
@@ -216,12 +252,12 @@ class AnimatedSprite(pygame.sprite.Sprite):
 
 class Heart(pygame.sprite.Sprite):
     def __init__(self, pos_x, pos_y, is_active=True):
-        super().__init__(player_group, all_sprites)
+        super().__init__(hearts_group, all_sprites)
         if not is_active:
-            self.image = player_heart_empty
+            self.image = load_image('heart_empty.png', color_key=-1)
 
         else:
-            self.image = player_heart_full
+            self.image = load_image('heart_full.png', color_key=-1)
 
         self.rect = self.image.get_rect().move(
             tile_width * pos_x + 25, tile_height * pos_y + 15)
@@ -233,10 +269,10 @@ class Heart(pygame.sprite.Sprite):
         self.pos_y = 0.0
 
     def damage(self):
-        self.image = player_heart_empty
+        self.image = load_image('heart_empty.png', color_key=-1)
 
     def heal(self):
-        self.image = player_heart_full
+        self.image = load_image('heart_full.png', color_key=-1)
 
 
 class Player(AnimatedSprite):
@@ -255,6 +291,10 @@ class Player(AnimatedSprite):
         self.pos_x = 0.0
         self.pos_y = 0.0
 
+        # положение до последнего шага симуляции
+        self.prev_x = self.x
+        self.prev_y = self.y
+
         self.player_speed = 0.0
 
         self.is_alive = True
@@ -267,8 +307,6 @@ class Player(AnimatedSprite):
     def update(self):
         super().update()
 
-        self.inventory.update_inventory()
-
         if not self.is_alive:
             self.kill()
 
@@ -335,6 +373,17 @@ class Player(AnimatedSprite):
         if abs(self.pos_y) < 0.1:
             self.pos_y = 0.0
 
+    def remember_position(self):
+        self.prev_x = self.x
+        self.prev_y = self.y
+
+    def render_rect(self, alpha):
+        """Положение для отрисовки между двумя шагами симуляции"""
+        return self.rect.move(
+            round(self.prev_x + (self.x - self.prev_x) * alpha) - self.rect.x,
+            round(self.prev_y + (self.y - self.prev_y) * alpha) - self.rect.y
+        )
+
     def stop_moving(self):
         self.pos_x = 0.0
         self.pos_y = 0.0
@@ -345,8 +394,13 @@ class Player(AnimatedSprite):
         self.animation_default()
 
     def hit(self):
-        for sprite in resource_group:
+        # сетка отдаёт ресурсы в порядке адресов; сортируем, чтобы добыча
+        # и частицы не зависели от него при воспроизведении ввода
+        hits = sorted(collision_grid.query_rect(self.rect, resource_group),
+                      key=lambda resource: resource.cell)
+        for sprite in hits:
             if pygame.sprite.collide_rect(self, sprite):
+                create_debris(sprite.rect.center)
                 obj, count = sprite.damage()
                 if obj is not None:
                     self.add_item(obj, count)
@@ -360,10 +414,12 @@ class Player(AnimatedSprite):
                         self.save_stats()
                         self.level_up()
 
-    def active(self):
-        for sprite in forge_group:
+    def furnace(self):
+        """Печь, у которой стоит игрок, или None"""
+        for sprite in collision_grid.query_rect(self.rect, forge_group):
             if pygame.sprite.collide_rect(self, sprite):
-                sprite.active(self.inventory)
+                return sprite
+        return None
 
     def damaged(self):
         self.health -= 1
@@ -394,8 +450,7 @@ class Player(AnimatedSprite):
         self.inventory.add_item(item, count)
 
     def load_stats(self):
-        with open('data/player/stats.json', 'r') as f:
-            stats = json.load(f)
+        stats = stats_store.load()
         try:
             self.health = stats['health']
             self.max_health = stats['health_max']
@@ -415,19 +470,13 @@ class Player(AnimatedSprite):
             self.experience = 0
 
     def save_stats(self):
-        with open('data/player/stats.json', 'w') as f:
-            json.dump(
-                {
-                    'health': self.health,
-                    'health_max': self.max_health,
-                    'experience': self.exp_bar.current_exp,
-                    'experience_max': self.exp_bar.max_exp,
-                    'level': self.level
-                },
-
-                f, ensure_ascii=False,
-                indent=4
-            )
+        stats_store.save({
+            'health': self.health,
+            'health_max': self.max_health,
+            'experience': self.exp_bar.current_exp,
+            'experience_max': self.exp_bar.max_exp,
+            'level': self.level
+        })
 
     def level_up(self):
         create_particles((self.rect.centerx, self.rect.centery - 200))
@@ -435,59 +484,44 @@ class Player(AnimatedSprite):
 
 def can_move_point(x_now, y_now, direction) -> bool:
     if direction == 'left':
-        for tile in water_group:
-            # or tile.point_in_tile(x_now - 4, y_now - 5) or tile.point_in_tile(x_now - 4, y_now + 5):
-            if tile.point_in_tile(x_now - 1, y_now):
-                return False
-        for tile in resource_group:
-            # or tile.point_in_tile(x_now - 4, y_now - 5) or tile.point_in_tile(x_now - 4, y_now + 5):
-            if tile.point_in_tile(x_now - 1, y_now):
-                return False
-        for tile in forge_group:
-            # or tile.point_in_tile(x_now - 4, y_now - 5) or tile.point_in_tile(x_now - 4, y_now + 5):
-            if tile.point_in_tile(x_now + 10, y_now):
-                return False
+        if in_water(x_now - 1, y_now):
+            return False
+        if blocked(x_now - 1, y_now, resource_group):
+            return False
+        if blocked(x_now + 10, y_now, forge_group):
+            return False
 
     if direction == 'right':
-        for tile in water_group:
-            # or tile.point_in_tile(x_now + 4, y_now - 5) or tile.point_in_tile(x_now + 4, y_now + 5):
-            if tile.point_in_tile(x_now + 16, y_now):
-                return False
-        for tile in resource_group:
-            # or tile.point_in_tile(x_now + 4, y_now - 5) or tile.point_in_tile(x_now + 4, y_now + 5):
-            if tile.point_in_tile(x_now + 6, y_now):
-                return False
-        for tile in forge_group:
-            # or tile.point_in_tile(x_now + 4, y_now - 5) or tile.point_in_tile(x_now + 4, y_now + 5):
-            if tile.point_in_tile(x_now + 6, y_now):
-                return False
+        if in_water(x_now + 16, y_now):
+            return False
+        if blocked(x_now + 6, y_now, resource_group):
+            return False
+        if blocked(x_now + 6, y_now, forge_group):
+            return False
 
     if direction == 'up':
-        for tile in water_group:
-            # or tile.point_in_tile(x_now - 5, y_now - 4) or tile.point_in_tile(x_now + 5, y_now - 4):
-            if tile.point_in_tile(x_now, y_now + 6):
-                return False
-        for tile in resource_group:
-            # or tile.point_in_tile(x_now - 5, y_now - 4) or tile.point_in_tile(x_now + 5, y_now - 4):
-            if tile.point_in_tile(x_now, y_now + 8):
-                return False
-        for tile in forge_group:
-            # or tile.point_in_tile(x_now - 5, y_now - 4) or tile.point_in_tile(x_now + 5, y_now - 4):
-            if tile.point_in_tile(x_now, y_now + 10):
-                return False
+        if in_water(x_now, y_now + 6):
+            return False
+        if blocked(x_now, y_now + 8, resource_group):
+            return False
+        if blocked(x_now, y_now + 10, forge_group):
+            return False
 
     if direction == 'down':
-        for tile in water_group:
-            # or tile.point_in_tile(x_now - 5, y_now + 4) or tile.point_in_tile(x_now + 5, y_now + 4):
-            if tile.point_in_tile(x_now, y_now + 14):
-                return False
-        for tile in resource_group:
-            # or tile.point_in_tile(x_now - 5, y_now + 4) or tile.point_in_tile(x_now + 5, y_now + 4):
-            if tile.point_in_tile(x_now, y_now + 6):
-                return False
-        for tile in forge_group:
-            # or tile.point_in_tile(x_now - 5, y_now + 4) or tile.point_in_tile(x_now + 5, y_now + 4):
-            if tile.point_in_tile(x_now, y_now + 6):
-                return False
+        if in_water(x_now, y_now + 14):
+            return False
+        if blocked(x_now, y_now + 6, resource_group):
+            return False
+        if blocked(x_now, y_now + 6, forge_group):
+            return False
 
     return True
+
+
+def in_water(x, y) -> bool:
+    tile_map = tiles_group.sprite
+    return tile_map is not None and tile_map.point_in_tile(x, y)
+
+
+def blocked(x, y, group) -> bool:
+    return bool(collision_grid.query_point(x, y, group))
@@ -1,8 +1,14 @@
-import json
 import pygame
 
-from main import *
-from scripts.utils import load_image
+from scripts.display import display, terminate, FPS, WIDTH, HEIGHT
+from scripts.objects.player import stats_store
+from scripts.utils import load_image, get_font, render_text
+
+BLACK = (0, 0, 0)
+LOADING_BAR_WIDTH = 400
+LOADING_BAR_HEIGHT = 24
+LOADING_BAR_COLOR = (80, 170, 80)
+LOADING_BAR_BACKGROUND = (230, 230, 230)
 
 
 def start_screen():
@@ -11,8 +17,9 @@ def start_screen():
                   "нажмите любую клавишу"]
 
     fon = pygame.transform.scale(load_image('fon.jpg'), (WIDTH, HEIGHT))
+    screen = display.surface
     screen.blit(fon, (0, 0))
-    font = pygame.font.Font(None, 30)
+    font = get_font(30)
     text_coord = 50
     for line in intro_text:
         string_rendered = font.render(line, 1, pygame.Color('black'))
@@ -31,51 +38,45 @@ def start_screen():
                     event.type == pygame.MOUSEBUTTONDOWN:
                 return
         pygame.display.flip()
-        clock.tick(FPS)
+        display.clock.tick(FPS)
 
 
-def reload_screen():
-    text = [
-        "Для продолжения",
-        "нажмите любую клавишу"
-    ]
+def loading_screen(screen, progress, ticks):
+    """Кадр экрана загрузки: фон, надпись с бегущими точками и полоса"""
+    screen.blit(load_image('loading.jpg', scale=(WIDTH, HEIGHT)), (0, 0))
 
-    fon = pygame.transform.scale(load_image('loading.jpg'), (WIDTH, HEIGHT))
-    screen.blit(fon, (0, 0))
-    font = pygame.font.Font(None, 30)
-    text_coord = 50
-    for line in text:
-        string_rendered = font.render(line, 1, pygame.Color('black'))
-        intro_rect = string_rendered.get_rect()
-        text_coord += 10
-        intro_rect.top = text_coord
-        intro_rect.x = 10
-        text_coord += intro_rect.height
-        screen.blit(string_rendered, intro_rect)
+    dots = '.' * (ticks // 15 % 4)
+    text = render_text('Загрузка' + dots, 30, BLACK)
+    screen.blit(text, (10, 60))
 
-    while True:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT or event.type == pygame.KEYDOWN or \
-                    event.type == pygame.MOUSEBUTTONDOWN:
-                return
-        pygame.display.flip()
-        clock.tick(FPS)
+    bar = pygame.Rect(0, 0, LOADING_BAR_WIDTH, LOADING_BAR_HEIGHT)
+    bar.midbottom = (WIDTH // 2, HEIGHT - 60)
+    pygame.draw.rect(screen, LOADING_BAR_BACKGROUND, bar)
+    filled = bar.copy()
+    filled.width = int(bar.width * progress)
+    pygame.draw.rect(screen, LOADING_BAR_COLOR, filled)
+    pygame.draw.rect(screen, BLACK, bar, 2)
+
+    percent = render_text(f'{int(progress * 100)}%', 24, BLACK)
+    screen.blit(percent, percent.get_rect(midbottom=bar.midtop).move(0, -6))
 
 
 def end_screen():
-    with open('data/player/stats.json', 'r') as f:
-        player = json.load(f)
+    # через хранилище: там последний снимок, даже если он ещё не записан
+    # или записывается в другой каталог (--record)
+    player = stats_store.load()
 
     results = [
         f'Ваши результаты:', ""
-        f'Ваше здоровье: {player["health"]}',
-        f'Ваш уровень: {player["level"]}',
-        f'Ваш опыт: {player["experience"]}'
+        f'Ваше здоровье: {player.get("health", 3)}',
+        f'Ваш уровень: {player.get("level", 1)}',
+        f'Ваш опыт: {player.get("experience", 0)}'
     ]
 
     fon = pygame.transform.scale(load_image('end.jpg'), (WIDTH, HEIGHT))
+    screen = display.surface
     screen.blit(fon, (0, 0))
-    font = pygame.font.Font(None, 30)
+    font = get_font(30)
     text_coord = 50
     for line in results:
         string_rendered = font.render(line, 1, pygame.Color('black'))
@@ -92,4 +93,4 @@ def end_screen():
                     event.type == pygame.MOUSEBUTTONDOWN:
                 terminate()
         pygame.display.flip()
-        clock.tick(FPS)
+        display.clock.tick(FPS)
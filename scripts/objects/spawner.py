@@ -0,0 +1,182 @@
+import numpy as np
+import pygame
+
+from scripts.levels import Level
+from scripts.rng import world_random
+from scripts.objects.objects import (
+    Furnace,
+    Resource,
+    get_resource_types,
+    tile_width,
+    tile_height
+)
+from scripts.objects.tilemap import CHUNK_SIZE
+
+# клетки, на которых могут появляться ресурсы
+SPAWN_CELLS = '.+'
+
+
+class ResourceSpawner:
+    """Множество свободных клеток уровня для появления ресурсов.
+
+    Клетки добавляются и убираются областями (add_area, remove_area) -
+    так World подключает только загруженные чанки.
+    """
+
+    def __init__(self, level, spacing=1, navigator=None,
+                 chunk_size=CHUNK_SIZE):
+        if not isinstance(level, Level):
+            level = Level.from_rows(level)
+        self.level = level
+        # поиск пути, которому сообщаем о занятых ресурсами клетках
+        self.navigator = navigator
+        # минимальное расстояние между ресурсами в клетках (диск Пуассона)
+        self.spacing = spacing
+        self.disk = [
+            (dx, dy)
+            for dy in range(-spacing + 1, spacing)
+            for dx in range(-spacing + 1, spacing)
+            if dx * dx + dy * dy < spacing * spacing
+        ] or [(0, 0)]
+
+        # свободные клетки: список для случайного выбора за O(1)
+        # и словарь клетка -> индекс в списке для удаления за O(1)
+        self.free = []
+        self.index = {}
+        # клетка -> сколько живых ресурсов закрывают её своим диском
+        self.blocked = {}
+        self.walkable = set()
+        # клетки, где ресурсы появились, пропали или получили урон;
+        # разбирает World при сохранении
+        self.changed = set()
+        # чанк -> {клетка: ресурс}, чтобы не перебирать весь мир;
+        # словарь, а не множество - порядок ресурсов не зависит от id
+        self.chunk_size = chunk_size
+        self.chunks = {}
+
+        # печи известны из заголовка уровня, даже если ещё не созданы
+        self.furnace_rects = [
+            pygame.Rect((x * tile_width, y * tile_height), Furnace.size)
+            for x, y in level.furnaces
+        ]
+
+    def __len__(self):
+        return len(self.free)
+
+    def chunk_of(self, x, y):
+        return x // self.chunk_size, y // self.chunk_size
+
+    def chunk_resources(self, key):
+        """Живые ресурсы чанка key"""
+        return self.chunks.get(key, {}).values()
+
+    def candidates(self, x0, y0, x1, y1):
+        """Клетки (x, y) области [x0, x1) x [y0, y1), подходящие по карте"""
+        level = self.level
+        x0, y0 = max(0, x0), max(0, y0)
+        x1, y1 = min(level.cols, x1), min(level.rows, y1)
+        if x0 >= x1 or y0 >= y1:
+            return []
+
+        grid = level.grid[max(0, y0 - 1):y1, max(0, x0 - 1):x1]
+        water = grid == ord('#')
+        # ресурс заходит на соседние клетки слева и сверху,
+        # поэтому там не должно быть воды (за краем карты - вода)
+        water = np.pad(water, ((y0 == 0, 0), (x0 == 0, 0)),
+                       constant_values=True)
+        ok = np.isin(grid[-(y1 - y0):, -(x1 - x0):],
+                     np.frombuffer(SPAWN_CELLS.encode('ascii'), np.uint8))
+        ok &= ~water[1:, :-1] & ~water[:-1, 1:] & ~water[:-1, :-1]
+
+        ys, xs = np.nonzero(ok)
+        return list(zip((xs + x0).tolist(), (ys + y0).tolist()))
+
+    def blocked_by_furnace(self, x, y):
+        rect = pygame.Rect(x * tile_width, y * tile_height,
+                           tile_width, tile_height)
+        return rect.collidelist(self.furnace_rects) != -1
+
+    def add_area(self, x0, y0, x1, y1):
+        for cell in self.candidates(x0, y0, x1, y1):
+            if not self.blocked_by_furnace(*cell):
+                self.walkable.add(cell)
+                if not self.blocked.get(cell):
+                    self._add_free(cell)
+
+    def remove_area(self, x0, y0, x1, y1):
+        for cell in self.candidates(x0, y0, x1, y1):
+            self.walkable.discard(cell)
+            self._remove_free(cell)
+
+    def _add_free(self, cell):
+        if cell in self.index:
+            return
+        self.index[cell] = len(self.free)
+        self.free.append(cell)
+
+    def _remove_free(self, cell):
+        i = self.index.pop(cell, None)
+        if i is None:
+            return
+        last = self.free.pop()
+        if last != cell:
+            self.free[i] = last
+            self.index[last] = i
+
+    def _block(self, x, y, amount):
+        for dx, dy in self.disk:
+            cell = (x + dx, y + dy)
+
+            # счётчик ведём и для незагруженных клеток,
+            # чтобы при загрузке они не оказались свободными
+            count = self.blocked.get(cell, 0) + amount
+            if count > 0:
+                self.blocked[cell] = count
+                self._remove_free(cell)
+            else:
+                self.blocked.pop(cell, None)
+                if cell in self.walkable:
+                    self._add_free(cell)
+
+    def spawn(self, type_resource=None):
+        if not self.free:
+            return None
+
+        x, y = world_random.choice(self.free)
+        if type_resource is None:
+            type_resource = world_random.choice(list(get_resource_types()))
+
+        self.changed.add((x, y))
+        return self.spawn_at(x, y, type_resource)
+
+    def spawn_at(self, x, y, type_resource):
+        resource = Resource(get_resource_types()[type_resource], x, y)
+        resource.spawner = self
+        self._block(x, y, 1)
+        self.chunks.setdefault(self.chunk_of(x, y), {})[x, y] = resource
+        if self.navigator is not None:
+            self.navigator.block(x, y)
+
+        return resource
+
+    def fill(self, count, group):
+        """Досоздать ресурсы, пока в group их меньше count"""
+        while len(group) < count and self.free:
+            self.spawn()
+
+    def touch(self, resource):
+        self.changed.add(resource.cell)
+
+    def release(self, resource):
+        if resource.spawner is not self:
+            return
+        resource.spawner = None
+        self.changed.add(resource.cell)
+        self._block(*resource.cell, -1)
+        key = self.chunk_of(*resource.cell)
+        resources = self.chunks[key]
+        del resources[resource.cell]
+        if not resources:
+            del self.chunks[key]
+        if self.navigator is not None:
+            self.navigator.unblock(*resource.cell)
@@ -0,0 +1,123 @@
+import numpy as np
+import pygame
+
+from scripts.levels import Level
+from scripts.objects.objects import tile_width, tile_height
+from scripts.utils import load_image, all_sprites, tiles_group, ImageCache
+
+# размер чанка в тайлах
+CHUNK_SIZE = 16
+# предел памяти запечённых чанков в байтах
+CHUNK_CACHE_LIMIT = 48 * 1024 * 1024
+
+# клетки карты, которые рисуются водой; всё остальное - земля
+WATER_CELLS = '#'
+
+# файлы тайлов; загружаются при запекании первого чанка
+tile_images = {
+    'water': 'water.png',
+    'empty': 'grass.png'
+}
+
+
+class TileMap(pygame.sprite.Sprite):
+    """Статичные слои земли и воды, запечённые в поверхности-чанки"""
+
+    def __init__(self, level, chunk_size=CHUNK_SIZE,
+                 cache_limit=CHUNK_CACHE_LIMIT):
+        super().__init__(tiles_group, all_sprites)
+        if not isinstance(level, Level):
+            level = Level.from_rows(level)
+        self.level = level
+        self.rows = level.rows
+        self.cols = level.cols
+        # коды символов воды; маска строится по кускам, не на всю карту
+        self.water_codes = np.frombuffer(WATER_CELLS.encode('ascii'), np.uint8)
+        self.water_set = set(self.water_codes.tolist())
+
+        self.chunk_size = chunk_size
+        self.chunk_width = tile_width * chunk_size
+        self.chunk_height = tile_height * chunk_size
+        self.chunks_x = -(-self.cols // chunk_size)
+        self.chunks_y = -(-self.rows // chunk_size)
+
+        # Запечённые чанки: (cx, cy) -> Surface, давно не видимые вытесняются
+        self.chunks = ImageCache(cache_limit)
+
+        # rect - положение карты в мире
+        self.rect = pygame.Rect(
+            0, 0, self.cols * tile_width, self.rows * tile_height)
+
+        self.x = self.rect.x
+        self.y = self.rect.y
+
+    def is_water_cell(self, col, row):
+        if 0 <= row < self.rows and 0 <= col < self.cols:
+            return int(self.level.grid[row, col]) in self.water_set
+        return True
+
+    def is_water_at(self, x, y):
+        """Вода в точке с координатами относительно начала карты"""
+        return self.is_water_cell(int(x // tile_width), int(y // tile_height))
+
+    def point_in_tile(self, x, y):
+        """Вода в точке мира"""
+        return self.is_water_at(x - self.rect.x, y - self.rect.y)
+
+    def bake_chunk(self, cx, cy):
+        col0 = cx * self.chunk_size
+        row0 = cy * self.chunk_size
+        cols = min(self.chunk_size, self.cols - col0)
+        rows = min(self.chunk_size, self.rows - row0)
+
+        surface = pygame.Surface(
+            (cols * tile_width, rows * tile_height)).convert()
+        water = load_image(tile_images['water'])
+        empty = load_image(tile_images['empty'])
+        cells = np.isin(self.level.grid[row0:row0 + rows, col0:col0 + cols],
+                        self.water_codes).tolist()
+
+        surface.blits([
+            (water if is_water else empty, (i * tile_width, j * tile_height))
+            for j, line in enumerate(cells)
+            for i, is_water in enumerate(line)
+        ], False)
+
+        self.chunks.put((cx, cy), surface)
+        return surface
+
+    def get_chunk(self, cx, cy):
+        chunk = self.chunks.get((cx, cy))
+        if chunk is None:
+            chunk = self.bake_chunk(cx, cy)
+        return chunk
+
+    def drop_chunk(self, cx, cy):
+        """Освободить поверхность чанка; при надобности он запечётся заново"""
+        self.chunks.discard((cx, cy))
+
+    def visible_chunks(self, view):
+        """Индексы чанков, попадающих в прямоугольник мира view"""
+        left = max(0, (view.left - self.rect.x) // self.chunk_width)
+        top = max(0, (view.top - self.rect.y) // self.chunk_height)
+        right = min(self.chunks_x - 1,
+                    (view.right - 1 - self.rect.x) // self.chunk_width)
+        bottom = min(self.chunks_y - 1,
+                     (view.bottom - 1 - self.rect.y) // self.chunk_height)
+
+        for cy in range(top, bottom + 1):
+            for cx in range(left, right + 1):
+                yield cx, cy
+
+    def items(self, camera):
+        """Список отрисовки видимых чанков"""
+        ox, oy = camera.offset
+        return [
+            (
+                (self, cx, cy),
+                self.get_chunk(cx, cy),
+                (self.rect.x + cx * self.chunk_width - ox,
+                 self.rect.y + cy * self.chunk_height - oy)
+            )
+            for cx, cy in self.visible_chunks(camera.view_rect)
+        ]
@@ -0,0 +1,184 @@
+from scripts.crafting import Smelter
+from scripts.navigation import Navigator
+from scripts.objects.objects import Furnace
+from scripts.objects.spawner import ResourceSpawner
+from scripts.saves import WorldSave
+
+# сколько чанков вокруг видимой области держать загруженными
+STREAM_RADIUS = 1
+# как часто сохранять изменённые чанки, в секундах
+AUTOSAVE_INTERVAL = 10.0
+
+
+class World:
+    """Потоковый мир: в памяти только чанки рядом с камерой.
+
+    У загруженного чанка есть клетки в ResourceSpawner, созданные печи
+    и ресурсы. Ресурсы хранятся в снимке WorldSave: изменённый чанк
+    пишется туда при выгрузке и при сохранении и читается при следующей
+    загрузке; поверхность чанка освобождается в TileMap. Очереди печей
+    тоже в снимке: восстановленная плавка отдаёт готовое в inventory.
+    """
+
+    def __init__(self, level, tilemap, inventory, radius=STREAM_RADIUS,
+                 save=None):
+        self.level = level
+        self.tilemap = tilemap
+        self.chunk_size = tilemap.chunk_size
+        self.radius = radius
+
+        self.navigator = Navigator(level)
+        # ресурсы не встают вплотную друг к другу и не замуровывают проходы
+        self.spawner = ResourceSpawner(level, spacing=2,
+                                       navigator=self.navigator,
+                                       chunk_size=self.chunk_size)
+        # без файла снимок живёт только до конца сцены
+        self.store = save if save is not None else WorldSave()
+        self.store.attach(level)
+        # загруженные чанки, изменившиеся после сохранения
+        self.dirty = set()
+        self.since_save = 0.0
+
+        self.loaded = set()
+        # чанк -> клетки печей по заголовку уровня и созданные печи
+        self.furnace_cells = {}
+        for x, y in level.furnaces:
+            self.furnace_cells.setdefault(self.chunk_of(x, y), []).append((x, y))
+        self.furnaces = {}
+        # клетка печи -> её очередь плавки; живёт и в выгруженных чанках
+        saved = self.store.load_smelters()
+        self.smelters = {
+            cell: (Smelter.from_state(saved[cell], inventory)
+                   if cell in saved else Smelter())
+            for cell in level.furnaces
+        }
+        # версии очередей на момент последнего сохранения
+        self.saved_versions = {
+            cell: smelter.version for cell, smelter in self.smelters.items()
+        }
+
+    def chunk_of(self, x, y):
+        return x // self.chunk_size, y // self.chunk_size
+
+    def chunk_area(self, key):
+        cx, cy = key
+        x0 = cx * self.chunk_size
+        y0 = cy * self.chunk_size
+        return x0, y0, x0 + self.chunk_size, y0 + self.chunk_size
+
+    def chunks_around(self, views, radius):
+        """Чанки, попадающие в прямоугольники мира views с запасом radius"""
+        tilemap = self.tilemap
+        chunks = set()
+        for view in views:
+            chunks.update(tilemap.visible_chunks(view.inflate(
+                2 * radius * tilemap.chunk_width,
+                2 * radius * tilemap.chunk_height)))
+        return chunks
+
+    def update(self, *views):
+        """Загрузить чанки рядом с views и выгрузить дальние; достроить
+        часть графов поиска пути"""
+        for _ in self.update_steps(*views):
+            pass
+        self.navigator.build()
+
+    def update_steps(self, *views):
+        """update по шагам: после каждого загруженного чанка выдаёт долю
+        готовности - так экран загрузки не замирает на большом мире"""
+        wanted = self.chunks_around(views, self.radius)
+        # выгружаем с запасом в чанк, чтобы на границе не дёргать диск
+        keep = self.chunks_around(views, self.radius + 1)
+
+        for key in self.loaded - keep:
+            self.unload_chunk(key)
+
+        missing = wanted - self.loaded
+        for i, key in enumerate(missing, 1):
+            self.load_chunk(key)
+            yield i / len(missing)
+
+    def load_chunk(self, key):
+        self.loaded.add(key)
+        area = self.chunk_area(key)
+        self.navigator.add_area(*area)
+        self.spawner.add_area(*area)
+
+        self.furnaces[key] = [
+            Furnace(x, y, self.smelters[x, y])
+            for x, y in self.furnace_cells.get(key, ())
+        ]
+
+        for name, x, y, health in self.store.load_chunk(key):
+            self.spawner.spawn_at(x, y, name).health = health
+
+    def collect_changes(self):
+        """Перенести изменённые клетки спаунера в грязные чанки"""
+        changed = self.spawner.changed
+        self.dirty.update(self.chunk_of(*cell) for cell in changed)
+        changed.clear()
+
+    def chunk_resources(self, keys):
+        """Ресурсы чанков keys: {чанк: [(вид, x, y, здоровье)]}"""
+        return {
+            key: [(resource.kind.name, *resource.cell, resource.health)
+                  for resource in self.spawner.chunk_resources(key)]
+            for key in keys
+        }
+
+    def smelter_states(self):
+        """Очереди, которые плавят или изменились после сохранения"""
+        return {
+            cell: smelter.to_state()
+            for cell, smelter in self.smelters.items()
+            if smelter.jobs or smelter.version != self.saved_versions[cell]
+        }
+
+    def save(self):
+        """Записать в снимок изменённые загруженные чанки и очереди печей"""
+        self.collect_changes()
+        self.store.save_chunks(self.chunk_resources(self.dirty & self.loaded),
+                               self.smelter_states())
+        self.dirty.clear()
+        for cell, smelter in self.smelters.items():
+            self.saved_versions[cell] = smelter.version
+        self.since_save = 0.0
+
+    def autosave(self, dt):
+        self.since_save += dt
+        if self.since_save >= AUTOSAVE_INTERVAL:
+            self.save()
+
+    def unload_chunk(self, key):
+        self.collect_changes()
+        if key in self.dirty:
+            self.store.save_chunks(self.chunk_resources([key]))
+            self.dirty.discard(key)
+
+        self.loaded.discard(key)
+
+        for resource in list(self.spawner.chunk_resources(key)):
+            resource.kill()
+        # выгрузка не меняет мир - сохранённый чанк остаётся как есть
+        self.spawner.changed.clear()
+
+        for furnace in self.furnaces.pop(key, ()):
+            furnace.kill()
+
+        area = self.chunk_area(key)
+        self.spawner.remove_area(*area)
+        self.navigator.remove_area(*area)
+        self.tilemap.drop_chunk(*key)
+
+    def update_smelters(self, dt):
+        """Плавка во всех печах уровня, в том числе в выгруженных чанках"""
+        for smelter in self.smelters.values():
+            if smelter.jobs:
+                smelter.update(dt)
+
+    def close(self):
+        """Сохранить мир и закрыть снимок; повторный вызов ничего не делает"""
+        if self.store.db is None:
+            return
+        self.save()
+        self.store.close()
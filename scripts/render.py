@@ -0,0 +1,63 @@
+"""Послойная отрисовка сцены.
+
+Слой - функция, собирающая команды (ключ, изображение, rect на экране),
+и признак статичности. Команды каждого слоя выводятся одним вызовом
+Surface.blits, слои рисуются по порядку.
+"""
+
+
+class Layer:
+    """Именованный слой отрисовки.
+
+    Статичный слой меняется только вместе с камерой: его команды не
+    сравниваются DirtyTracker и собираются прямо при отрисовке.
+    """
+
+    def __init__(self, name, collect, static=False):
+        self.name = name
+        self.collect = collect
+        self.static = static
+
+
+class RenderPipeline:
+    def __init__(self, layers, background):
+        self.layers = layers
+        self.background = background
+        # границы динамических слоёв в последнем списке отрисовки
+        self.bounds = []
+
+    def collect(self, scene):
+        """Список отрисовки динамических слоёв для DirtyTracker"""
+        items = []
+        self.bounds = []
+        for layer in self.layers:
+            if not layer.static:
+                start = len(items)
+                items += layer.collect(scene)
+                self.bounds.append((layer, start, len(items)))
+        return items
+
+    def render(self, screen, scene, items):
+        """Нарисовать слои; items - список из collect, в конце его могут
+        быть чужие команды (оверлей), они рисуются поверх всех слоёв"""
+        stage = scene.manager.metrics.stage
+        with stage('tiles'):
+            screen.fill(self.background)
+
+        bounds = iter(self.bounds)
+        end = 0
+        for layer in self.layers:
+            if layer.static:
+                with stage('tiles'):
+                    blit(screen, layer.collect(scene))
+            else:
+                _, start, end = next(bounds)
+                with stage('sprites'):
+                    blit(screen, items[start:end])
+
+        if len(items) > end:
+            blit(screen, items[end:])
+
+
+def blit(screen, commands):
+    screen.blits([(image, rect) for _, image, rect in commands], False)
@@ -0,0 +1,192 @@
+"""Запись и воспроизведение ввода игровых сцен.
+
+Файл - заголовок (магия, версия, seed, имя сцены, данные игрока в JSON),
+по записи на кадр игровой сцены (число шагов симуляции, зажатые клавиши
+движения, мышь, нажатые за кадр клавиши) и сводка состояния в конце,
+по которой воспроизведение сверяется с записью.
+
+Запись: python main.py --record session.rpl [--seed N]
+Воспроизведение: python bench.py --replay session.rpl
+"""
+import hashlib
+import json
+import struct
+
+import pygame
+
+from scripts.metrics import io_counts
+from scripts.rng import rng_state
+from scripts.utils import resource_group
+
+MAGIC = b'SRPL'
+VERSION = 1
+# магия, версия, seed, длина имени сцены, длина данных игрока
+HEADER = struct.Struct('<4sHqHI')
+# шаги, клавиши движения (биты MOVE_KEYS), мышь x, y, кнопки мыши (биты),
+# число нажатых клавиш; за записью идут их коды по байту
+FRAME = struct.Struct('<BBhhBB')
+# магия, число кадров, сводка состояния (нули - сводки нет)
+FOOTER = struct.Struct('<4sI20s')
+FOOTER_MAGIC = b'SEND'
+
+# клавиши, которые сцены читают через get_pressed
+MOVE_KEYS = (
+    pygame.K_LEFT, pygame.K_a, pygame.K_RIGHT, pygame.K_d,
+    pygame.K_UP, pygame.K_w, pygame.K_DOWN, pygame.K_s,
+)
+# нажатия, которые обрабатывают сцены; код события - индекс в кортеже
+EVENT_KEYS = (
+    pygame.K_e, pygame.K_TAB, pygame.K_f, pygame.K_p, pygame.K_ESCAPE,
+)
+QUIT_CODE = len(EVENT_KEYS)
+
+
+class HeldKeys:
+    """Замена pygame.key.get_pressed() по битам MOVE_KEYS"""
+
+    def __init__(self, bits=0):
+        self.bits = bits
+
+    def __getitem__(self, key):
+        if key not in MOVE_KEYS:
+            return False
+        return bool(self.bits >> MOVE_KEYS.index(key) & 1)
+
+
+def encode_keys(pressed):
+    return sum(1 << i for i, key in enumerate(MOVE_KEYS) if pressed[key])
+
+
+def encode_events(events):
+    codes = []
+    for event in events:
+        if event.type == pygame.QUIT:
+            codes.append(QUIT_CODE)
+        elif event.type == pygame.KEYDOWN and event.key in EVENT_KEYS:
+            codes.append(EVENT_KEYS.index(event.key))
+    return codes
+
+
+def decode_events(codes):
+    return [
+        pygame.event.Event(pygame.QUIT) if code == QUIT_CODE
+        else pygame.event.Event(pygame.KEYDOWN, key=EVENT_KEYS[code], mod=0)
+        for code in codes
+    ]
+
+
+def ends_session(events):
+    """Выход из игры или на экран результатов - запись на этом кончается"""
+    return any(
+        event.type == pygame.QUIT
+        or event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE
+        for event in events
+    )
+
+
+def state_digest(scene):
+    """Сводка состояния игровой сцены: игрок, ресурсы и генераторы"""
+    player = scene.player
+    state = (
+        type(scene).__name__,
+        player.x, player.y, player.health, player.level, player.experience,
+        sorted(player.inventory.inventory_dict.items()),
+        sorted((r.kind.name, r.cell, r.health) for r in resource_group),
+        rng_state(),
+    )
+    return hashlib.sha1(repr(state).encode()).digest()
+
+
+class InputRecorder:
+    def __init__(self, path, seed, player_data):
+        self.path = path
+        self.seed = seed
+        # сохранения игрока на момент начала записи
+        self.player_data = player_data
+        self.file = None
+        self.frames = 0
+
+    def start(self, scene):
+        """Заголовок пишется перед первым кадром первой игровой сцены"""
+        if self.file is not None:
+            return
+
+        io_counts['opens'] += 1
+        self.file = open(self.path, 'wb')
+        name = type(scene).__name__.encode('ascii')
+        data = json.dumps(self.player_data).encode('utf-8')
+        self.file.write(HEADER.pack(MAGIC, VERSION, self.seed,
+                                    len(name), len(data)))
+        self.file.write(name + data)
+
+    def record(self, steps, pressed, mouse, events):
+        (x, y), buttons = mouse
+        codes = encode_events(events)
+        self.file.write(FRAME.pack(
+            steps, encode_keys(pressed), x, y,
+            sum(1 << i for i, down in enumerate(buttons[:3]) if down),
+            len(codes)))
+        self.file.write(bytes(codes))
+        self.frames += 1
+
+    def finish(self, scene):
+        """Дописать сводку; сцена без игрока (загрузка) сводки не даёт"""
+        if self.file is None:
+            return
+
+        digest = bytes(20)
+        if getattr(scene, 'recordable', False):
+            digest = state_digest(scene)
+        self.file.write(FOOTER.pack(FOOTER_MAGIC, self.frames, digest))
+        io_counts['writes'] += 1
+        self.file.close()
+        self.file = None
+
+
+class Replay:
+    def __init__(self, seed, scene, player_data, frames, digest):
+        self.seed = seed
+        self.scene = scene
+        self.player_data = player_data
+        # (шаги, клавиши движения, мышь, коды нажатий) по кадрам
+        self.frames = frames
+        self.digest = digest
+
+
+def read_replay(path):
+    io_counts['opens'] += 1
+    with open(path, 'rb') as f:
+        data = f.read()
+
+    if len(data) < HEADER.size:
+        raise ValueError('replay file is truncated')
+    magic, version, seed, name_size, data_size = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError('not a replay file')
+
+    offset = HEADER.size
+    scene = data[offset:offset + name_size].decode('ascii')
+    offset += name_size
+    player_data = json.loads(data[offset:offset + data_size])
+    offset += data_size
+
+    end = len(data)
+    digest = None
+    footer = data[-FOOTER.size:]
+    if len(data) - offset >= FOOTER.size and footer[:4] == FOOTER_MAGIC:
+        _, _, digest = FOOTER.unpack(footer)
+        end -= FOOTER.size
+        if not any(digest):
+            digest = None
+
+    # без сводки (игра упала) читаем кадры до конца файла
+    frames = []
+    while offset + FRAME.size <= end:
+        steps, keys, x, y, buttons, count = FRAME.unpack_from(data, offset)
+        offset += FRAME.size
+        codes = list(data[offset:offset + count])
+        offset += count
+        mouse = (x, y), tuple(bool(buttons >> i & 1) for i in range(3))
+        frames.append((steps, keys, mouse, codes))
+
+    return Replay(seed, scene, player_data, frames, digest)
@@ -0,0 +1,23 @@
+"""Генераторы случайных чисел мира.
+
+Всё случайное в игре - появление ресурсов, добыча, частицы - берёт
+числа отсюда, а не из глобального random: с одним seed и одним вводом
+игра повторяется в точности (см. scripts/replay.py).
+"""
+import random
+
+import numpy as np
+
+world_random = random.Random()
+particle_random = np.random.default_rng()
+
+
+def seed_world(seed):
+    world_random.seed(seed)
+    # генератор меняем на месте - модули держат ссылку на него
+    particle_random.bit_generator.state = np.random.PCG64(seed).state
+
+
+def rng_state():
+    """Состояние обоих генераторов для сверки воспроизведения"""
+    return world_random.getstate(), particle_random.bit_generator.state
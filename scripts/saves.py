@@ -0,0 +1,186 @@
+"""Снимки мира в SQLite.
+
+В базе по строке на чанк: ресурсы чанка упакованы в двоичную запись
+(вид, клетка, здоровье). World сохраняет только изменившиеся чанки,
+поэтому запись большого мира занимает миллисекунды. Очереди печей
+лежат по строке на клетку печи и пишутся в той же транзакции.
+"""
+import os
+import sqlite3
+import struct
+
+from scripts.metrics import io_counts
+
+SAVES_DIR = 'saves'
+
+# версия схемы в PRAGMA user_version; снимок другой версии начинается заново
+VERSION = 2
+# индекс вида, клетка x, y, здоровье
+RESOURCE = struct.Struct('<HIIh')
+# задание печи: индекс рецепта, осталось единиц
+JOB = struct.Struct('<HI')
+
+SCHEMA = {
+    'meta': 'CREATE TABLE meta (key TEXT PRIMARY KEY, value INTEGER)',
+    # имена видов ресурсов и рецептов
+    'kinds': 'CREATE TABLE kinds (id INTEGER PRIMARY KEY, name TEXT UNIQUE)',
+    'chunks': 'CREATE TABLE chunks (cx INTEGER, cy INTEGER, resources BLOB, '
+              'PRIMARY KEY (cx, cy)) WITHOUT ROWID',
+    'smelters': 'CREATE TABLE smelters (x INTEGER, y INTEGER, '
+                'progress REAL, jobs BLOB, '
+                'PRIMARY KEY (x, y)) WITHOUT ROWID',
+}
+
+
+def save_path(filename):
+    """Файл снимка для уровня из levels/"""
+    name = os.path.splitext(os.path.basename(filename))[0]
+    return os.path.join(SAVES_DIR, name + '.db')
+
+
+class WorldSave:
+    """Снимок мира; без path живёт в памяти до конца сцены"""
+
+    def __init__(self, path=None):
+        self.path = path
+        if path is not None:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+
+        self.db = self.connect()
+        self.kind_ids = {}
+        self.kind_names = {}
+        self.writes = 0
+
+    def connect(self):
+        io_counts['opens'] += 1
+        db = sqlite3.connect(self.path or ':memory:', isolation_level=None)
+        try:
+            version = db.execute('PRAGMA user_version').fetchone()[0]
+            if version != VERSION:
+                self.reset(db)
+        except sqlite3.DatabaseError:
+            # повреждённый файл - начинаем с чистого мира
+            db.close()
+            os.remove(self.path)
+            db = sqlite3.connect(self.path, isolation_level=None)
+            self.reset(db)
+
+        if self.path is not None:
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+        return db
+
+    @staticmethod
+    def reset(db):
+        db.execute('BEGIN')
+        for table, create in SCHEMA.items():
+            db.execute(f'DROP TABLE IF EXISTS {table}')
+            db.execute(create)
+        db.execute(f'PRAGMA user_version = {VERSION}')
+        db.execute('COMMIT')
+
+    def attach(self, level):
+        """Проверить, что снимок сделан для этого уровня, иначе очистить"""
+        meta = {
+            'cols': level.cols,
+            'rows': level.rows,
+            'source_mtime': level.source_mtime,
+        }
+        saved = dict(self.db.execute('SELECT key, value FROM meta'))
+        if saved and saved != meta:
+            self.reset(self.db)
+            saved = {}
+
+        if not saved:
+            self.db.execute('BEGIN')
+            self.db.executemany('INSERT INTO meta VALUES (?, ?)', meta.items())
+            self.db.execute('COMMIT')
+
+        self.read_kinds()
+
+    def read_kinds(self):
+        self.kind_ids = dict(self.db.execute('SELECT name, id FROM kinds'))
+        self.kind_names = {i: name for name, i in self.kind_ids.items()}
+
+    def kind_id(self, name):
+        # вызывается внутри транзакции save_chunks
+        kind = self.kind_ids.get(name)
+        if kind is None:
+            kind = self.db.execute(
+                'INSERT INTO kinds (name) VALUES (?)', (name,)).lastrowid
+            self.kind_ids[name] = kind
+            self.kind_names[kind] = name
+        return kind
+
+    def load_chunk(self, key):
+        """Ресурсы чанка: [(вид, x, y, здоровье)]; пусто, если не сохранялся"""
+        row = self.db.execute(
+            'SELECT resources FROM chunks WHERE cx = ? AND cy = ?', key
+        ).fetchone()
+        if row is None:
+            return []
+
+        names = self.kind_names
+        return [
+            (names[kind], x, y, health)
+            for kind, x, y, health in RESOURCE.iter_unpack(row[0])
+        ]
+
+    def load_smelters(self):
+        """Очереди печей: {(x, y): (прогресс, [(рецепт, единиц)])}"""
+        names = self.kind_names
+        return {
+            (x, y): (progress, [
+                (names[recipe], count)
+                for recipe, count in JOB.iter_unpack(jobs)
+            ])
+            for x, y, progress, jobs in self.db.execute(
+                'SELECT x, y, progress, jobs FROM smelters')
+        }
+
+    def save_chunks(self, chunks, smelters=None):
+        """Записать чанки {ключ: [(вид, x, y, здоровье)]} и очереди печей
+        {(x, y): (прогресс, [(рецепт, единиц)])} одной транзакцией;
+        печь с пустой очередью удаляется из снимка"""
+        if not chunks and not smelters:
+            return
+
+        db = self.db
+        db.execute('BEGIN')
+        try:
+            rows = []
+            for (cx, cy), resources in chunks.items():
+                data = b''.join(
+                    RESOURCE.pack(self.kind_id(name), x, y, health)
+                    for name, x, y, health in resources
+                )
+                rows.append((cx, cy, data))
+            db.executemany(
+                'INSERT OR REPLACE INTO chunks VALUES (?, ?, ?)', rows)
+
+            for (x, y), (progress, jobs) in (smelters or {}).items():
+                if not jobs:
+                    db.execute('DELETE FROM smelters WHERE x = ? AND y = ?',
+                               (x, y))
+                    continue
+                data = b''.join(
+                    JOB.pack(self.kind_id(name), count)
+                    for name, count in jobs
+                )
+                db.execute(
+                    'INSERT OR REPLACE INTO smelters VALUES (?, ?, ?, ?)',
+                    (x, y, progress, data))
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            # новые виды откатились вместе с чанками и печами
+            self.read_kinds()
+            raise
+
+        io_counts['writes'] += 1
+        self.writes += 1
+
+    def close(self):
+        if self.db is not None:
+            self.db.close()
+            self.db = None
@@ -0,0 +1,108 @@
+import pygame
+
+
+class SpatialGrid:
+    """Равномерная сетка для быстрого поиска спрайтов по координатам"""
+
+    def __init__(self, cell_size):
+        self.cell_size = cell_size
+        # (cx, cy) -> множество спрайтов, задевающих клетку
+        self.cells = {}
+        # спрайт -> его прямоугольник в сетке
+        self.rects = {}
+        # число запросов за всё время (для замеров кадра)
+        self.queries = 0
+
+    def __len__(self):
+        return len(self.rects)
+
+    def __contains__(self, sprite):
+        return sprite in self.rects
+
+    def _cell_range(self, rect):
+        size = self.cell_size
+        for cy in range(rect.top // size, (rect.bottom - 1) // size + 1):
+            for cx in range(rect.left // size, (rect.right - 1) // size + 1):
+                yield cx, cy
+
+    def cell_count(self, rect):
+        """Сколько клеток сетки задевает rect"""
+        size = self.cell_size
+        return (((rect.right - 1) // size - rect.left // size + 1)
+                * ((rect.bottom - 1) // size - rect.top // size + 1))
+
+    def add(self, sprite, rect):
+        if sprite in self.rects:
+            self.remove(sprite)
+
+        rect = pygame.Rect(rect)
+        self.rects[sprite] = rect
+        for cell in self._cell_range(rect):
+            self.cells.setdefault(cell, set()).add(sprite)
+
+    def remove(self, sprite):
+        rect = self.rects.pop(sprite, None)
+        if rect is None:
+            return
+
+        for cell in self._cell_range(rect):
+            bucket = self.cells.get(cell)
+            if bucket is not None:
+                bucket.discard(sprite)
+                if not bucket:
+                    del self.cells[cell]
+
+    def move(self, sprite, rect):
+        old = self.rects.get(sprite)
+        if old is not None and old == rect:
+            return
+        self.add(sprite, rect)
+
+    def get_rect(self, sprite):
+        return self.rects.get(sprite)
+
+    def clear(self):
+        self.cells.clear()
+        self.rects.clear()
+
+    def query_point(self, x, y, group=None):
+        self.queries += 1
+        bucket = self.cells.get(
+            (int(x) // self.cell_size, int(y) // self.cell_size))
+        if not bucket:
+            return []
+
+        return [
+            sprite for sprite in bucket
+            if self.rects[sprite].collidepoint(x, y)
+            and (group is None or sprite in group)
+        ]
+
+    def query_rect(self, rect, group=None):
+        self.queries += 1
+        rect = pygame.Rect(rect)
+        found = set()
+        for cell in self._cell_range(rect):
+            bucket = self.cells.get(cell)
+            if bucket:
+                found.update(bucket)
+
+        return [
+            sprite for sprite in found
+            if self.rects[sprite].colliderect(rect)
+            and (group is None or sprite in group)
+        ]
+
+    def query_radius(self, x, y, radius, group=None):
+        area = pygame.Rect(x - radius, y - radius,
+                           radius * 2 + 1, radius * 2 + 1)
+        result = []
+        for sprite in self.query_rect(area, group):
+            rect = self.rects[sprite]
+            # ближайшая к центру точка прямоугольника
+            near_x = min(max(x, rect.left), rect.right - 1)
+            near_y = min(max(y, rect.top), rect.bottom - 1)
+            if (near_x - x) ** 2 + (near_y - y) ** 2 <= radius ** 2:
+                result.append(sprite)
+
+        return result
@@ -0,0 +1,135 @@
+import atexit
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from scripts.metrics import io_counts
+
+# как часто фоновый поток сбрасывает изменения на диск, в секундах
+FLUSH_INTERVAL = 2.0
+
+log = logging.getLogger(__name__)
+
+stores = []
+
+_lock = threading.Lock()
+_writer = None
+
+
+class JsonStore:
+    """JSON-файл с отложенной записью.
+
+    save() только запоминает копию данных; на диск пишет фоновый поток
+    раз в FLUSH_INTERVAL секунд, повторные изменения между записями
+    склеиваются в одну.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.pending = None
+        self.dirty = False
+        self.writes = 0
+        # держится на время записи, чтобы старый снимок не затёр новый
+        self.write_lock = threading.Lock()
+
+        stores.append(self)
+
+    def load(self, default=None):
+        # последний сохранённый снимок новее файла, пока тот не записан
+        with _lock:
+            if self.pending is not None:
+                return dict(self.pending)
+
+        try:
+            io_counts['opens'] += 1
+            with open(self.path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {} if default is None else default
+
+    def save(self, data):
+        with _lock:
+            self.pending = dict(data)
+            self.dirty = True
+        start_writer()
+
+    def flush(self):
+        with self.write_lock:
+            with _lock:
+                if not self.dirty:
+                    return
+                data = self.pending
+
+            self._write(data)
+            # пока шла запись, мог прийти новый снимок - он ещё не записан;
+            # при ошибке записи снимок остаётся грязным до следующей попытки
+            with _lock:
+                if self.pending is data:
+                    self.dirty = False
+
+    def _write(self, data):
+        folder = os.path.dirname(self.path) or '.'
+        fd, tmp_path = tempfile.mkstemp(
+            dir=folder, prefix='.tmp-', suffix='.json')
+        io_counts['opens'] += 1
+        io_counts['writes'] += 1
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f, ensure_ascii=False, indent=4)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        self.writes += 1
+
+
+def redirect_stores(folder):
+    """Перенести файлы всех хранилищ в folder - сохранения игрока не меняются"""
+    for store in stores:
+        store.path = os.path.join(folder, os.path.basename(store.path))
+
+
+def snapshot_stores():
+    """Текущие данные всех хранилищ по именам файлов"""
+    return {os.path.basename(store.path): store.load() for store in stores}
+
+
+def restore_stores(data):
+    for store in stores:
+        store.save(data.get(os.path.basename(store.path), {}))
+
+
+def flush_all():
+    # ошибка одного файла не мешает записать остальные и не роняет
+    # фоновый поток; несохранённое он запишет при следующем проходе
+    for store in stores:
+        try:
+            store.flush()
+        except OSError:
+            log.exception('failed to write %s', store.path)
+
+
+def _writer_loop():
+    while True:
+        time.sleep(FLUSH_INTERVAL)
+        flush_all()
+
+
+def start_writer():
+    global _writer
+    if _writer is not None:
+        return
+
+    _writer = threading.Thread(
+        target=_writer_loop, name='storage-writer', daemon=True)
+    _writer.start()
+
+
+atexit.register(flush_all)
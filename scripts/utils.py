@@ -1,35 +1,220 @@
 import os
+from collections import OrderedDict
 
 import pygame
 
-all_sprites = pygame.sprite.Group()
-tiles_group = pygame.sprite.Group()
-
-water_group = pygame.sprite.Group()
-grount_group = pygame.sprite.Group()
+from scripts.spatial import SpatialGrid
 
-resource_group = pygame.sprite.Group()
-resource_bars_group = pygame.sprite.Group()
+all_sprites = pygame.sprite.Group()
+tiles_group = pygame.sprite.GroupSingle()
 
 exp_bar_group = pygame.sprite.Group()
 inventory_group = pygame.sprite.Group()
 
-stars_group = pygame.sprite.Group()
-
 forge_group = pygame.sprite.Group()
 furnace_interface_group = pygame.sprite.Group()
 
 
-def load_image(name, type_data="", color_key=None, scale=None):
+def screen_items(group):
+    """Список отрисовки группы в экранных координатах"""
+    return [(sprite, sprite.image, sprite.rect) for sprite in group]
+
+
+# Препятствия (ресурсы, печи) в мировых координатах
+collision_grid = SpatialGrid(150)
+
+
+class CellLayer:
+    """Замена группы спрайтов для лёгких объектов, занимающих клетку.
+
+    Клетка -> объект; len, in и перебор работают как у Group, объекты
+    сразу попадают в collision_grid.
+    """
+
+    def __init__(self):
+        self.cells = {}
+
+    def __len__(self):
+        return len(self.cells)
+
+    def __iter__(self):
+        return iter(self.cells.values())
+
+    def __contains__(self, obj):
+        return self.cells.get(getattr(obj, 'cell', None)) is obj
+
+    def get(self, cell):
+        return self.cells.get(cell)
+
+    def add(self, obj):
+        self.cells[obj.cell] = obj
+        collision_grid.add(obj, obj.rect)
+
+    def remove(self, obj):
+        if self.cells.get(obj.cell) is obj:
+            del self.cells[obj.cell]
+            collision_grid.remove(obj)
+
+    def empty(self):
+        for obj in list(self.cells.values()):
+            obj.kill()
+
+
+resource_group = CellLayer()
+
+
+# Предел памяти кэша изображений в байтах
+IMAGE_CACHE_LIMIT = 64 * 1024 * 1024
+
+# Мелкие спрайты, которые упаковываются в общий атлас:
+# (name, type_data, color_key, scale) - как в аргументах load_image
+ATLAS_SPRITES = [
+    ('heart_full.png', '', -1, None),
+    ('heart_empty.png', '', -1, None),
+    ('star.png', '', -1, None),
+    ('wood.png', '', None, None),
+    ('strawberry.png', '', None, None),
+    ('ore/ore_iron.png', '', None, None),
+    ('ore/ore_gold.png', '', None, None),
+    ('ore/ore_stone.png', '', None, None),
+    ('ingot/ingot_iron.png', '', None, None),
+    ('ingot/ingot_gold.png', '', None, None),
+]
+
+
+class ImageCache:
+    """Кэш готовых изображений с вытеснением давно не используемых"""
+
+    def __init__(self, limit=IMAGE_CACHE_LIMIT):
+        self.limit = limit
+        self.size = 0
+        self.images = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+
+    def __contains__(self, key):
+        return key in self.images
+
+    def __len__(self):
+        return len(self.images)
+
+    @staticmethod
+    def image_size(image):
+        return image.get_width() * image.get_height() * image.get_bytesize()
+
+    def get(self, key):
+        image = self.images.get(key)
+        if image is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.images.move_to_end(key)
+        return image
+
+    def put(self, key, image):
+        if key in self.images:
+            self.size -= self.image_size(self.images.pop(key))
+
+        self.images[key] = image
+        self.size += self.image_size(image)
+
+        while self.size > self.limit and len(self.images) > 1:
+            _, old = self.images.popitem(last=False)
+            self.size -= self.image_size(old)
+
+    def discard(self, key):
+        image = self.images.pop(key, None)
+        if image is not None:
+            self.size -= self.image_size(image)
+
+    def clear(self):
+        self.images.clear()
+        self.size = 0
+
+
+class TextureAtlas:
+    """Общая поверхность с упакованными по полкам мелкими спрайтами"""
+
+    def __init__(self, width=256, padding=1):
+        self.width = width
+        self.padding = padding
+        self.surface = None
+        self.regions = {}
+
+    def __contains__(self, key):
+        return key in self.regions
+
+    def pack(self, images):
+        # самые высокие спрайты кладём первыми, чтобы полки были плотнее
+        order = sorted(images, key=lambda k: -images[k].get_height())
+
+        places = {}
+        x = y = shelf_height = 0
+        for key in order:
+            w, h = images[key].get_size()
+            if x + w > self.width:
+                x = 0
+                y += shelf_height + self.padding
+                shelf_height = 0
+            places[key] = pygame.Rect(x, y, w, h)
+            x += w + self.padding
+            shelf_height = max(shelf_height, h)
+
+        height = max(1, y + shelf_height)
+        self.surface = pygame.Surface(
+            (self.width, height), pygame.SRCALPHA).convert_alpha()
+        self.surface.fill((0, 0, 0, 0))
+
+        self.surface.blits(
+            [(images[key], places[key]) for key in order], False)
+
+        self.regions = {
+            key: self.surface.subsurface(rect) for key, rect in places.items()
+        }
+
+    def get(self, key):
+        return self.regions.get(key)
+
+
+def image_key(name, type_data="", color_key=None, scale=None):
+    fullname = os.path.join('data', type_data, name)
+    if scale is not None:
+        scale = tuple(scale)
+    if isinstance(color_key, list):
+        color_key = tuple(color_key)
+    return fullname, color_key, scale
+
+
+image_cache = ImageCache()
+atlas = TextureAtlas()
+atlas_keys = {image_key(*spec) for spec in ATLAS_SPRITES}
+
+
+def read_image(name, type_data=""):
+    """Декодированный файл без приведения к формату экрана.
+
+    pygame отпускает GIL на время декодирования, поэтому функцию можно
+    звать из рабочего потока.
+    """
     fullname = os.path.join('data', type_data, name)
 
     try:
-        image = pygame.image.load(fullname).convert()
+        return pygame.image.load(fullname)
 
     except pygame.error as message:
         print('Cannot load image:', name)
         raise SystemExit(message)
 
+
+def decode_image(name, type_data="", color_key=None, scale=None):
+    return prepare_image(read_image(name, type_data), color_key, scale)
+
+
+def prepare_image(image, color_key=None, scale=None):
+    image = image.convert()
+
     if color_key is not None:
         if color_key == -1:
             color_key = image.get_at((0, 0))
@@ -44,16 +229,83 @@ def load_image(name, type_data="", color_key=None, scale=None):
     return image
 
 
-class RectSprite(pygame.sprite.Sprite):
-    def __init__(self, rect, color):
-        super().__init__()
-        self.image = pygame.Surface([rect.width, rect.height])
-        self.image.fill(color)
-        self.rect = rect
+def build_atlas():
+    atlas.pack({
+        image_key(*spec): decode_image(*spec) for spec in ATLAS_SPRITES
+    })
+
+
+def is_image_loaded(name, type_data="", color_key=None, scale=None):
+    key = image_key(name, type_data, color_key, scale)
+    return key in image_cache or key in atlas_keys
+
+
+def preload_image(image, name, type_data="", color_key=None, scale=None):
+    """Положить в кэш изображение, заранее декодированное read_image"""
+    key = image_key(name, type_data, color_key, scale)
+    if key not in image_cache and key not in atlas_keys:
+        image_cache.put(key, prepare_image(image, color_key, scale))
+
+
+def load_image(name, type_data="", color_key=None, scale=None):
+    """Изображение из кэша; с диска читается только при первом запросе.
+
+    Возвращаемая поверхность общая для всех вызовов - менять её нельзя.
+    """
+    key = image_key(name, type_data, color_key, scale)
+
+    if key in atlas_keys:
+        if atlas.surface is None:
+            build_atlas()
+        return atlas.get(key)
+
+    image = image_cache.get(key)
+    if image is None:
+        image = decode_image(name, type_data, color_key, scale)
+        image_cache.put(key, image)
+
+    return image
+
+
+def item_icon(name):
+    """Иконка предмета инвентаря: руды и слитки лежат в своих папках"""
+    for folder in ("ore", "ingot"):
+        if name.startswith(folder):
+            return load_image(f"{folder}/{name}.png")
+    return load_image(f"{name}.png")
+
 
+# Предел памяти кэша отрисованных строк в байтах
+TEXT_CACHE_LIMIT = 4 * 1024 * 1024
 
-my_rect = pygame.Rect(100, 100, 500, 500)
-rect_sprite = RectSprite(my_rect, (255, 0, 0))
+fonts = {}
+text_cache = ImageCache(TEXT_CACHE_LIMIT)
+
+
+def get_font(size, name=None):
+    """Общий на всю игру шрифт заданного размера"""
+    key = (name, size)
+    font = fonts.get(key)
+    if font is None:
+        font = fonts[key] = pygame.font.Font(name, size)
+    return font
+
+
+def render_text(text, size, color, antialias=True, font_name=None):
+    """Отрисованная строка из кэша; повторяющиеся числа и надписи
+    рендерятся шрифтом один раз"""
+    key = (font_name, size, text, tuple(color), antialias)
+
+    image = text_cache.get(key)
+    if image is None:
+        image = get_font(size, font_name).render(text, antialias, color)
+        text_cache.put(key, image)
+
+    return image
+
+
+def transparent_surface(size):
+    image = pygame.Surface(size, pygame.SRCALPHA)
+    image.fill((0, 0, 0, 0))
+    return image
 
-sprite_group = pygame.sprite.Group()
-sprite_group.add(rect_sprite)
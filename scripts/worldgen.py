@@ -0,0 +1,276 @@
+"""Процедурные уровни из seed.
+
+Карта собирается из тех же клеток, что и уровни в levels/: '#' вода,
+'.' земля, '@' игрок, '+' печь. Земля - шум значений по решётке, узлы
+которой хешируются из seed и координат, поэтому каждый чанк генерации
+(CHUNK x CHUNK клеток) считается сам по себе и совпадает с тем же
+местом целой карты: чанки можно строить в разных процессах или по мере
+надобности.
+
+Связность тоже обеспечивается внутри чанка: от середины чанка к
+соседям идут гати - полосы земли, которые сходятся с гатями соседей.
+Мелкие островки, не связанные с гатями, затапливаются, крупные
+соединяются с ближайшей гатью прямой насыпью.
+
+Запуск: python -m scripts.worldgen 1024 --seed 7 -o levels/generated.txt
+"""
+import argparse
+import time
+
+import numpy as np
+
+from scripts.grid import label
+from scripts.levels import Level
+
+# сторона чанка генерации в клетках
+CHUNK = 256
+# вода по краю карты
+MARGIN = 2
+# ширина прибрежной полосы, где суша уходит в море
+COAST_WIDTH = 48
+# островки меньше этого числа клеток затапливаются, а не соединяются
+MIN_ISLAND = 32
+# доля чанков с печью
+FURNACE_CHANCE = 0.25
+
+# периоды октав шума высоты и влажности в клетках
+ELEVATION_OCTAVES = (128, 64, 32, 16, 8)
+MOISTURE_OCTAVES = (512, 256, 128)
+# уровень воды: в сухих областях озёр почти нет, во влажных - болота
+DRY_WATER_LEVEL = 0.22
+WET_WATER_LEVEL = 0.5
+
+WATER = ord('#')
+LAND = ord('.')
+SPAWN = ord('@')
+FURNACE = ord('+')
+
+# соли хеша для независимых случайных величин
+ELEVATION_SALT = 1
+MOISTURE_SALT = 2
+FURNACE_SALT = 3
+
+MASK64 = (1 << 64) - 1
+
+
+def mix(seed, salt):
+    return (seed * 0x9E3779B97F4A7C15 + salt * 0xD1B54A32D192ED03) & MASK64
+
+
+def lattice(seed, salt, xs, ys):
+    """Числа [0, 1) в узлах решётки ys x xs; зависят только от seed,
+    salt и координат узла (splitmix64)"""
+    h = (xs.astype(np.uint64)[None, :] * np.uint64(0x9E3779B97F4A7C15)
+         ^ ys.astype(np.uint64)[:, None] * np.uint64(0xC2B2AE3D27D4EB4F)
+         ^ np.uint64(mix(seed, salt)))
+    h ^= h >> np.uint64(30)
+    h *= np.uint64(0xBF58476D1CE4E5B9)
+    h ^= h >> np.uint64(27)
+    h *= np.uint64(0x94D049BB133111EB)
+    h ^= h >> np.uint64(31)
+    return (h >> np.uint64(40)).astype(np.float32) / np.float32(1 << 24)
+
+
+def smoothstep(t):
+    return t * t * (3 - 2 * t)
+
+
+def value_noise(seed, salt, x0, y0, width, height, period):
+    """Шум значений одной октавы в прямоугольнике карты"""
+    xs = np.arange(x0, x0 + width)
+    ys = np.arange(y0, y0 + height)
+    ix, iy = xs // period, ys // period
+    sx = smoothstep((xs % period).astype(np.float32) / period)
+    sy = smoothstep((ys % period).astype(np.float32) / period)
+
+    nodes = lattice(seed, salt, np.arange(ix[0], ix[-1] + 2),
+                    np.arange(iy[0], iy[-1] + 2))
+    ix -= ix[0]
+    iy -= iy[0]
+    # сначала вдоль строк решётки, потом между ними
+    rows = nodes[:, ix] * (1 - sx) + nodes[:, ix + 1] * sx
+    return rows[iy] * (1 - sy)[:, None] + rows[iy + 1] * sy[:, None]
+
+
+def fractal_noise(seed, salt, x0, y0, width, height, periods):
+    """Сумма октав с весами 1, 1/2, 1/4...; значения в [0, 1)"""
+    total = np.zeros((height, width), np.float32)
+    weight = 1.0
+    for octave, period in enumerate(periods):
+        total += weight * value_noise(seed, salt + octave * 16, x0, y0,
+                                      width, height, period)
+        weight /= 2
+    return total / (2 - 2 * weight)
+
+
+def chunk_bounds(size, cx, cy):
+    x0, y0 = cx * CHUNK, cy * CHUNK
+    return x0, y0, min(x0 + CHUNK, size), min(y0 + CHUNK, size)
+
+
+def generate_chunk(seed, size, cx, cy):
+    """Клетки чанка (cx, cy) карты size x size; не зависит от соседей"""
+    x0, y0, x1, y1 = chunk_bounds(size, cx, cy)
+    width, height = x1 - x0, y1 - y0
+
+    elevation = fractal_noise(seed, ELEVATION_SALT, x0, y0, width, height,
+                              ELEVATION_OCTAVES)
+    moisture = fractal_noise(seed, MOISTURE_SALT, x0, y0, width, height,
+                             MOISTURE_OCTAVES)
+
+    # к краю карты суша понижается - берег, а не обрыв
+    xs = np.arange(x0, x1)
+    ys = np.arange(y0, y1)
+    edge = np.minimum.outer(np.minimum(ys, size - 1 - ys),
+                            np.minimum(xs, size - 1 - xs))
+    coast = np.clip((edge - MARGIN) / COAST_WIDTH, 0, 1).astype(np.float32)
+    water_level = DRY_WATER_LEVEL + (WET_WATER_LEVEL - DRY_WATER_LEVEL) * \
+        smoothstep(moisture)
+    land = elevation * (0.6 + 0.4 * coast) - (1 - coast) * 0.3 > water_level
+
+    # гати от середины чанка к соседним чанкам; к краю карты не идут
+    last = (size - 1) // CHUNK
+    mid_row, mid_col = height // 2, width // 2
+    roads = np.zeros_like(land)
+    roads[mid_row, mid_col if cx == 0 else 0:
+          mid_col + 1 if cx == last else width] = True
+    roads[mid_row if cy == 0 else 0:
+          mid_row + 1 if cy == last else height, mid_col] = True
+    inside = edge >= MARGIN
+    roads &= inside
+    land |= roads
+    land &= inside
+
+    connect(land, roads, mid_row, mid_col)
+
+    grid = np.where(land, LAND, WATER).astype(np.uint8)
+    place_furnace(seed, grid, roads, cx, cy)
+
+    center = size // 2
+    if x0 <= center < x1 and y0 <= center < y1 and roads[mid_row, mid_col]:
+        grid[mid_row, mid_col] = SPAWN
+    return grid
+
+
+def connect(land, roads, mid_row, mid_col):
+    """Затопить мелкие островки, не связанные с гатями, и провести
+    насыпи к крупным; land меняется на месте"""
+    labels, count = label(land)
+    if not count:
+        return
+
+    sizes = np.bincount(labels.ravel(), minlength=count + 1)
+    linked = np.zeros(count + 1, bool)
+    linked[np.unique(labels[roads])] = True
+    linked[0] = True
+
+    small = ~linked & (sizes < MIN_ISLAND)
+    land[small[labels]] = False
+
+    islands = np.nonzero(~linked & ~small)[0]
+    if not len(islands):
+        return
+
+    # для каждого островка - клетка с самой короткой насыпью до гати:
+    # по столбцу до средней строки или по строке до среднего столбца,
+    # а если там гати нет - дальше по средней линии до середины чанка
+    ys, xs = np.nonzero(np.isin(labels, islands))
+    to_row = np.abs(ys - mid_row)
+    to_col = np.abs(xs - mid_col)
+    by_column = to_row + np.where(roads[mid_row, xs], 0, to_col)
+    by_row = to_col + np.where(roads[ys, mid_col], 0, to_row)
+    order = np.lexsort((np.minimum(by_column, by_row), labels[ys, xs]))
+    _, first = np.unique(labels[ys, xs][order], return_index=True)
+
+    for i in order[first]:
+        y, x = ys[i], xs[i]
+        if by_column[i] <= by_row[i]:
+            land[min(y, mid_row):max(y, mid_row) + 1, x] = True
+            if not roads[mid_row, x]:
+                land[mid_row, min(x, mid_col):max(x, mid_col) + 1] = True
+        else:
+            land[y, min(x, mid_col):max(x, mid_col) + 1] = True
+            if not roads[y, mid_col]:
+                land[min(y, mid_row):max(y, mid_row) + 1, mid_col] = True
+
+
+def place_furnace(seed, grid, roads, cx, cy):
+    """Печь (2 x 2 клетки) в части чанков: только посреди суши, чтобы
+    её можно было обойти, и не на гатях"""
+    chance, pick = lattice(seed, FURNACE_SALT, np.array([cx, cx + 1]),
+                           np.array([cy]))[0]
+    if chance >= FURNACE_CHANCE:
+        return
+
+    # клетка подходит, если земля всё окно 4 x 4 вокруг печи
+    land = grid == LAND
+    land[roads] = False
+    height, width = land.shape
+    if height < 4 or width < 4:
+        return
+    ok = np.ones((height - 3, width - 3), bool)
+    for dy in range(4):
+        for dx in range(4):
+            ok &= land[dy:dy + height - 3, dx:dx + width - 3]
+
+    ys, xs = np.nonzero(ok)
+    if len(ys):
+        i = int(pick * len(ys))
+        grid[ys[i] + 1, xs[i] + 1] = FURNACE
+
+
+def chunk_job(job):
+    seed, size, cx, cy = job
+    return cx, cy, generate_chunk(seed, size, cx, cy)
+
+
+def generate_world(size, seed, workers=1):
+    """Уровень size x size; workers > 1 - чанки в отдельных процессах"""
+    count = (size + CHUNK - 1) // CHUNK
+    jobs = [(seed, size, cx, cy) for cy in range(count) for cx in range(count)]
+    if workers > 1:
+        # только для генерации - пул не нужен при обычном запуске игры
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(workers) as pool:
+            chunks = list(pool.map(chunk_job, jobs))
+    else:
+        chunks = map(chunk_job, jobs)
+
+    grid = np.empty((size, size), np.uint8)
+    for cx, cy, cells in chunks:
+        x0, y0, x1, y1 = chunk_bounds(size, cx, cy)
+        grid[y0:y1, x0:x1] = cells
+
+    spawn = None
+    spawns = np.argwhere(grid == SPAWN)
+    if len(spawns):
+        y, x = spawns[-1].tolist()
+        spawn = (x, y)
+    furnaces = [(x, y) for y, x in np.argwhere(grid == FURNACE).tolist()]
+    return Level(grid, spawn, furnaces)
+
+
+def write_text(level, path):
+    with open(path, 'wb') as f:
+        f.write(b'\n'.join(row.tobytes() for row in level.grid))
+        f.write(b'\n')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Генерация уровня по seed')
+    parser.add_argument('size', type=int, help='сторона карты в клетках')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=1,
+                        help='процессов для генерации чанков')
+    parser.add_argument('-o', '--output', help='записать карту в текстовый файл')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    level = generate_world(args.size, args.seed, args.workers)
+    elapsed = time.perf_counter() - start
+    water = np.count_nonzero(level.grid == WATER) / level.grid.size
+    print(f'{args.size}x{args.size} seed {args.seed}: {elapsed:.2f} s, '
+          f'water {water:.0%}, furnaces {len(level.furnaces)}, '
+          f'spawn {level.spawn}')
+    if args.output:
+        write_text(level, args.output)